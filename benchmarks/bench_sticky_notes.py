@@ -0,0 +1,223 @@
+"""Headless benchmarks for sticky_notes.py.
+
+Runs StickyNotesApp on the offscreen Qt platform against synthetic note
+corpora in a temporary directory and reports timings in milliseconds plus
+the peak RSS of each run as JSON. Every corpus runs in its own process, so
+peak RSS and module state are not shared between runs.
+
+    python benchmarks/bench_sticky_notes.py --output results.json
+    python benchmarks/bench_sticky_notes.py --baseline results.json
+
+With --baseline, each metric is compared against the stored run and the
+exit status is 1 if any got slower (or bigger) than --threshold allows.
+"""
+import argparse
+import json
+import os
+import platform
+import random
+import resource
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+SIZES = (10, 100, 1000, 10000)
+BODIES = ("small", "large")
+WORDS = ("lorem", "ipsum", "dolor", "sit", "amet", "todo", "call", "meeting",
+         "groceries", "deadline", "idea", "draft", "review", "notes", "budget")
+
+
+def make_body(rng, kind):
+    if kind == "small":
+        count = rng.randint(5, 60)
+    else:
+        # Several times LARGE_NOTE_CHARS once joined, so these go out of line
+        count = rng.randint(40000, 60000)
+    return " ".join(rng.choice(WORDS) for _ in range(count))
+
+
+def make_corpus(count, body, visible_ratio, seed=0):
+    rng = random.Random(seed)
+    notes = []
+    # Large bodies are expensive to generate and hold; a few are enough
+    # to exercise the out-of-line path at every corpus size
+    large_every = max(count // 10, 1)
+    for i in range(count):
+        kind = "large" if body == "large" and i % large_every == 0 else "small"
+        notes.append({
+            "id": "%032x" % rng.getrandbits(128),
+            "title": "Note %d %s" % (i, rng.choice(WORDS)),
+            "content": make_body(rng, kind),
+            "font_size": 18,
+            "is_visible": rng.random() < visible_ratio,
+            "color_index": rng.randrange(6),
+            "size": [rng.randint(200, 500), rng.randint(200, 500)],
+            "pos": [rng.randint(0, 1600), rng.randint(0, 900)],
+        })
+    return {"theme": "dark", "notes": notes}
+
+
+def timed(func, *args):
+    start = time.perf_counter()
+    func(*args)
+    return (time.perf_counter() - start) * 1000
+
+
+def run_corpus(count, body, visible_ratio, repeat):
+    """Benchmark one corpus in this process and return its metrics."""
+    os.environ["QT_QPA_PLATFORM"] = "offscreen"
+    workdir = tempfile.mkdtemp(prefix="sticky-bench-")
+    # SAVE_FILE and friends are derived from this at import time
+    os.environ["SNAP_USER_COMMON"] = workdir
+    sys.path.insert(0, ROOT)
+    try:
+        import sticky_notes as sn
+        from PyQt5.QtCore import QEvent
+        from PyQt5.QtWidgets import QApplication, QMessageBox, QDialog
+
+        with open(sn.SAVE_FILE, "w") as f:
+            json.dump(make_corpus(count, body, visible_ratio), f)
+        if sn.STORAGE_BACKEND == "binary":
+            sn.convert_save_file(sn.SAVE_FILE, sn.BINARY_FILE)
+
+        # Auto-answer the prompts the measured operations would raise
+        QMessageBox.exec_ = lambda self: QMessageBox.Yes
+        QMessageBox.warning = staticmethod(lambda *args, **kwargs: QMessageBox.Ok)
+        sn.ShowHideDialog.exec_ = lambda self: QDialog.Accepted
+
+        app = QApplication([])
+        metrics = {}
+        start = time.perf_counter()
+        window = sn.StickyNotesApp()
+        window.finish_materialising()
+        metrics["startup_ms"] = (time.perf_counter() - start) * 1000
+
+        def load():
+            window.load_notes()
+            window.finish_materialising()
+        loads = []
+        for _ in range(repeat):
+            loads.append(timed(load))
+            # Destroy the replaced windows now, outside the timing, or every
+            # reload would add a full set to the peak RSS
+            QApplication.sendPostedEvents(None, QEvent.DeferredDelete)
+        metrics["load_notes_ms"] = statistics.median(loads)
+
+        def save():
+            # One edited note, as after a typical burst of typing
+            record = next((r for r in window.records.values() if r.widget is not None), None)
+            if record is not None:
+                record.widget.text_edit.insertPlainText("x")
+            window.save_notes(force=True)
+            window.save_worker.flush()
+        metrics["save_notes_ms"] = statistics.median(timed(save) for _ in range(repeat))
+
+        records = list(window.records.values())
+        deletes = [timed(window.delete_note, record) for record in records[:repeat]]
+        metrics["delete_note_ms"] = statistics.median(deletes)
+        adds = [timed(window.add_note, "bench %d" % i) for i in range(repeat)]
+        metrics["add_note_ms"] = statistics.median(adds)
+        app.processEvents()
+
+        metrics["toggle_theme_ms"] = statistics.median(timed(window.toggle_theme) for _ in range(repeat))
+        metrics["open_showhide_dialog_ms"] = timed(window.open_showhide_dialog)
+
+        window.quit_app()
+        # ru_maxrss is in KiB on Linux
+        metrics["peak_rss_kib"] = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return metrics
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+def run_all(sizes, bodies, visible_ratio, repeat):
+    results = {}
+    for body in bodies:
+        for count in sizes:
+            name = "%s-%d" % (body, count)
+            print("running %s..." % name, file=sys.stderr)
+            proc = subprocess.run(
+                [sys.executable, os.path.abspath(__file__), "--worker", str(count), body,
+                 "--visible-ratio", str(visible_ratio), "--repeat", str(repeat)],
+                stdout=subprocess.PIPE, stderr=subprocess.DEVNULL, check=True)
+            # The app prints its own log lines; the metrics are the last line
+            results[name] = json.loads(proc.stdout.decode().strip().splitlines()[-1])
+    return results
+
+
+def compare(results, baseline, threshold):
+    """Print each metric against the baseline; return the regressed ones."""
+    regressions = []
+    for name, metrics in results.items():
+        old = baseline.get("results", {}).get(name)
+        if old is None:
+            continue
+        for key, value in metrics.items():
+            before = old.get(key)
+            if not before:
+                continue
+            ratio = value / before
+            flag = ""
+            if ratio > 1 + threshold:
+                flag = "  REGRESSION"
+                regressions.append((name, key, before, value))
+            print("%-12s %-26s %12.2f -> %12.2f  (%+.0f%%)%s"
+                  % (name, key, before, value, (ratio - 1) * 100, flag))
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark sticky_notes.py headlessly.")
+    parser.add_argument("--sizes", default=",".join(map(str, SIZES)),
+                        help="comma-separated note counts (default: %(default)s)")
+    parser.add_argument("--bodies", default=",".join(BODIES),
+                        help="comma-separated body kinds: small, large (default: %(default)s)")
+    parser.add_argument("--visible-ratio", type=float, default=0.1,
+                        help="share of notes that are shown (default: %(default)s)")
+    parser.add_argument("--repeat", type=int, default=5,
+                        help="samples per operation; the median is reported (default: %(default)s)")
+    parser.add_argument("--output", help="write the results to this JSON file")
+    parser.add_argument("--baseline", help="compare against a results file from an earlier run")
+    parser.add_argument("--threshold", type=float, default=0.2,
+                        help="allowed slowdown before a metric counts as a regression (default: %(default)s)")
+    parser.add_argument("--worker", nargs=2, metavar=("COUNT", "BODY"), help=argparse.SUPPRESS)
+    args = parser.parse_args(argv)
+
+    if args.worker:
+        metrics = run_corpus(int(args.worker[0]), args.worker[1], args.visible_ratio, args.repeat)
+        print(json.dumps(metrics))
+        return 0
+
+    sizes = [int(size) for size in args.sizes.split(",")]
+    bodies = args.bodies.split(",")
+    data = {
+        "meta": {
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "backend": os.getenv("STICKY_NOTES_BACKEND", "json"),
+            "visible_ratio": args.visible_ratio,
+            "repeat": args.repeat,
+            "time": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        },
+        "results": run_all(sizes, bodies, args.visible_ratio, args.repeat),
+    }
+    text = json.dumps(data, indent=2)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(text + "\n")
+    else:
+        print(text)
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        if compare(data["results"], baseline, args.threshold):
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,25 +1,298 @@
 import sys
 import json
 import os
-from PyQt5.QtWidgets import (
-    QApplication, QMainWindow, QWidget, QVBoxLayout, QTextEdit, QLabel, QSystemTrayIcon, QMenu, QAction,
-    QPushButton, QHBoxLayout, QInputDialog, QSpinBox, QScrollArea, QFrame, QGridLayout, QMessageBox, QDialog, QCheckBox, QDialogButtonBox, QColorDialog, QToolButton, QSlider, QSizeGrip, QLayout, QLineEdit, QShortcut, QTextBrowser
-)
-from PyQt5.QtCore import Qt, QTimer, QSize
-from PyQt5.QtGui import QIcon, QFont, QColor, QPixmap, QPainter, QIntValidator, QLinearGradient, QKeySequence
+import sqlite3
+import bisect
+import mmap
+import struct
+import zlib
+import argparse
+import cProfile
+import functools
+import pstats
+import logging
+import time
+import threading
+import uuid
+try:
+    import fcntl
+except ImportError:  # Windows: only in-process locking
+    fcntl = None
 import re
 import weakref
 import math
 
-SAVE_INTERVAL = 1000  # 1 second, in milliseconds
+logger = logging.getLogger("sticky_notes")
+_PROCESS_START = time.perf_counter()
+
+class _NullSpan:
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+_NULL_SPAN = _NullSpan()
+
+class _Span:
+    __slots__ = ("metrics", "name", "start")
+
+    def __init__(self, metrics, name):
+        self.metrics = metrics
+        self.name = name
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.metrics.add_time(self.name, time.perf_counter() - self.start)
+        return False
+
+class Metrics:
+    """Counters and timing spans, exported to a JSON file on request."""
+
+    def __init__(self, enabled=False):
+        self.enabled = enabled
+        self.counters = {}
+        self.spans = {}
+        self._lock = threading.Lock()
+
+    def count(self, name, amount=1):
+        # Also called from the save worker thread
+        with self._lock:
+            self.counters[name] = self.counters.get(name, 0) + amount
+
+    def span(self, name):
+        if not self.enabled:
+            return _NULL_SPAN
+        return _Span(self, name)
+
+    def add_time(self, name, seconds):
+        with self._lock:
+            calls, total, worst = self.spans.get(name, (0, 0.0, 0.0))
+            self.spans[name] = (calls + 1, total + seconds, max(worst, seconds))
+        logger.debug("%s took %.2f ms", name, seconds * 1000)
+
+    def timed(self, name):
+        """Decorator form of span() for whole methods."""
+        def decorate(func):
+            @functools.wraps(func)
+            def wrapper(*args, **kwargs):
+                if not self.enabled:
+                    return func(*args, **kwargs)
+                with _Span(self, name):
+                    return func(*args, **kwargs)
+            return wrapper
+        return decorate
+
+    def snapshot(self):
+        with self._lock:
+            return {
+                "counters": dict(self.counters),
+                "spans": {
+                    name: {"calls": calls, "total_ms": total * 1000,
+                           "mean_ms": total * 1000 / calls, "max_ms": worst * 1000}
+                    for name, (calls, total, worst) in self.spans.items()
+                },
+            }
+
+    def export(self, path, **extra):
+        data = self.snapshot()
+        data.update(extra)
+        _atomic_write(path, json.dumps(data, indent=2))
+        logger.info("Metrics written to %s", path)
+
+metrics = Metrics(enabled=bool(os.getenv("STICKY_NOTES_METRICS")))
+
+class EventLoopProfiler:
+    """cProfile around the GUI thread, switched on and off at runtime.
+
+    stop() writes the raw stats (for pstats or snakeviz) plus a text
+    summary next to them that lists our own functions apart from Qt and
+    other native code, so slow handlers stand out from the event loop
+    machinery that calls them. The save worker thread is not profiled.
+    """
+
+    SUMMARY_LINES = 40
+
+    def __init__(self):
+        self.profile = None
+        self.path = None
+        self.started = None
+
+    @property
+    def active(self):
+        return self.profile is not None
+
+    def start(self, path):
+        if self.profile is not None:
+            return
+        self.path = path
+        self.started = time.perf_counter()
+        self.profile = cProfile.Profile()
+        self.profile.enable()
+        logger.info("Profiling to %s", path)
+
+    def stop(self):
+        if self.profile is None:
+            return
+        profile, self.profile = self.profile, None
+        profile.disable()
+        elapsed = time.perf_counter() - self.started
+        profile.dump_stats(self.path)
+        with open(self.path + ".txt", 'w') as f:
+            f.write(self.summary(pstats.Stats(profile), elapsed))
+        logger.info("Profile written to %s", self.path)
+
+    @classmethod
+    def summary(cls, stats, elapsed):
+        ours = []
+        native = []
+        for (filename, lineno, name), (_, calls, own, total, _) in stats.stats.items():
+            if filename == __file__:
+                ours.append((total, own, calls, f"{name} (line {lineno})"))
+            elif filename == "~":
+                native.append((own, total, calls, name))
+        ours.sort(reverse=True)
+        native.sort(reverse=True)
+        lines = [f"Profiled {elapsed:.1f} s of the GUI thread", "",
+                 "sticky_notes.py, by cumulative time (includes the Qt calls they make):",
+                 f"{'cumtime':>10} {'tottime':>10} {'calls':>8}  function"]
+        for total, own, calls, name in ours[:cls.SUMMARY_LINES]:
+            lines.append(f"{total:10.3f} {own:10.3f} {calls:8d}  {name}")
+        lines += ["", "Qt and other native code, by own time (exec_ includes idle waiting):",
+                  f"{'tottime':>10} {'cumtime':>10} {'calls':>8}  function"]
+        for own, total, calls, name in native[:cls.SUMMARY_LINES]:
+            lines.append(f"{own:10.3f} {total:10.3f} {calls:8d}  {name}")
+        return "\n".join(lines) + "\n"
+
+profiler = EventLoopProfiler()
+
+SAVE_INTERVAL = 1000  # autosave debounce window after a change, in milliseconds
 # SAVE_FILE = os.path.expanduser("~/.sticky_notes_data.json")
 SAVE_FILE = os.path.join(os.getenv("SNAP_USER_COMMON", os.path.expanduser("~")), "sticky_notes_data.json")
+SQLITE_FILE = os.path.join(os.path.dirname(SAVE_FILE), "sticky_notes_data.sqlite3")
+BINARY_FILE = os.path.join(os.path.dirname(SAVE_FILE), "sticky_notes_data.snb")
+# Storage backend: "json" (snapshot + journal), "sqlite" or "binary"
+STORAGE_BACKEND = os.getenv("STICKY_NOTES_BACKEND", "json")
+JOURNAL_SUFFIX = ".journal"
+# Bodies longer than this are kept in their own file and edited as plain text
+LARGE_NOTE_CHARS = 64 * 1024
+BLOB_DIR = os.path.join(os.path.dirname(SAVE_FILE), "sticky_notes_blobs")
+HISTORY_FILE = os.path.join(os.path.dirname(SAVE_FILE), "sticky_notes_history.json")
+# Total size of kept revisions, in characters; the oldest go first
+HISTORY_BUDGET = int(os.getenv("STICKY_NOTES_HISTORY_BUDGET", 2 * 1024 * 1024))
+HISTORY_KEYFRAME_INTERVAL = 10  # a full copy at least every this many revisions
+JOURNAL_COMPACT_BYTES = 256 * 1024  # fold the journal into the snapshot past this size
+METRICS_FILE = os.path.join(os.path.dirname(SAVE_FILE), "sticky_notes_metrics.json")
+PROFILE_FILE = os.path.join(os.path.dirname(SAVE_FILE), "sticky_notes.prof")
+# Held while the save files are written or read, by every instance
+LOCK_FILE = os.path.join(os.path.dirname(SAVE_FILE), "sticky_notes.lock")
+EXTERNAL_CHANGE_DELAY = 250  # let another writer finish before reloading, in milliseconds
 
 DEFAULT_FONT_SIZE = 15
 MIN_FONT_SIZE = 8
 MAX_FONT_SIZE = 24
-MAX_NOTES = 100
+MAX_SEARCH_RESULTS = 200
+MAX_NOTES = 10000  # hidden notes stay as plain data, so only shown notes cost a window
 NOTES_PER_COLUMN = 3
+NOTE_MARGIN = 20           # gap kept between placed notes and screen edges
+SPATIAL_CELL_SIZE = 200    # bucket size of the note placement grid, in pixels
+PLACEMENT_ROW_STEP = 40    # vertical step when scanning a screen for free space
+STARTUP_BATCH_SIZE = 16    # note windows built per event-loop turn at startup
+INDEX_BATCH_CHARS = 64 * 1024   # note text tokenised per idle event-loop turn
+# Dragged notes snap to nearby note and screen edges within this many
+# pixels; 0 turns snapping off, and holding Shift skips it for one drag
+SNAP_DISTANCE = int(os.getenv("STICKY_NOTES_SNAP_DISTANCE", 12))
+# Build the pooled dialogs (see DialogPool) while idle after startup, so
+# even the first one opens instantly; 0 builds each on first use instead
+PREWARM_DIALOGS = os.getenv("STICKY_NOTES_PREWARM_DIALOGS", "1") != "0"
+# Keyboard shortcuts of the shared actions (see ActionRegistry); they work
+# in every window of the app and act on the active note where they need one
+DEFAULT_SHORTCUTS = {
+    "new_note": "Ctrl+N",
+    "hide_note": "Ctrl+H",
+    "show_hide": "Ctrl+S",
+    "about": "Ctrl+I",
+}
+# One running instance per save file; later launches forward to it
+INSTANCE_SERVER_NAME = "sticky-notes-%08x" % zlib.crc32(os.path.abspath(SAVE_FILE).encode("utf-8"))
+INSTANCE_CONNECT_TIMEOUT = 200  # milliseconds
+INSTANCE_REPLY_TIMEOUT = 2000   # milliseconds
+
+def parse_args(argv):
+    parser = argparse.ArgumentParser(description="Sticky Notes Simple")
+    parser.add_argument("--convert", nargs=2, metavar=("SRC", "DST"),
+                        help="convert a save file between JSON and the binary format, then exit")
+    parser.add_argument("--profile", nargs="?", const=PROFILE_FILE, metavar="FILE",
+                        default=os.getenv("STICKY_NOTES_PROFILE") or None,
+                        help=f"profile the GUI thread until quit and write the stats to FILE "
+                             f"(default {PROFILE_FILE}; also STICKY_NOTES_PROFILE=FILE)")
+    parser.add_argument("--export", nargs=2, metavar=("FORMAT", "PATH"),
+                        help="write all notes to a JSONL file or a directory of Markdown files "
+                             "(FORMAT jsonl or markdown), then exit")
+    parser.add_argument("--import", dest="import_notes", nargs=2, metavar=("FORMAT", "PATH"),
+                        help="merge notes from a JSONL file or Markdown directory, then exit")
+    parser.add_argument("--merge-by", choices=("id", "title"), default="id",
+                        help="how --import matches existing notes (default: id)")
+    commands = parser.add_mutually_exclusive_group()
+    commands.add_argument("--new-note", nargs="?", const="", metavar="TITLE",
+                          help="create a note (asks for a title if none is given)")
+    commands.add_argument("--show-all", action="store_true", help="show all notes")
+    commands.add_argument("--show-hide", action="store_true", help="open the Show/Hide Notes dialog")
+    # Anything else (e.g. Qt's own options) is left for QApplication
+    return parser.parse_known_args(argv[1:])
+
+def command_from_args(args):
+    """The request a launch with these arguments makes of the app."""
+    if args.new_note is not None:
+        return {"command": "new_note", "title": args.new_note}
+    if args.show_all:
+        return {"command": "show_all"}
+    if args.show_hide:
+        return {"command": "show_hide"}
+    return {"command": "activate"}
+
+def send_to_running_instance(command):
+    """Hand command to an instance that is already running.
+
+    Returns False if there is none. Only QtCore and QtNetwork are needed,
+    so a forwarding launch never pays for the widget stack.
+    """
+    from PyQt5.QtNetwork import QLocalSocket
+    socket = QLocalSocket()
+    socket.connectToServer(INSTANCE_SERVER_NAME)
+    if not socket.waitForConnected(INSTANCE_CONNECT_TIMEOUT):
+        return False
+    socket.write(json.dumps(command).encode("utf-8") + b"\n")
+    socket.waitForBytesWritten(INSTANCE_REPLY_TIMEOUT)
+    if not socket.waitForReadyRead(INSTANCE_REPLY_TIMEOUT):
+        logger.warning("Running instance did not answer %s", command["command"])
+    socket.disconnectFromServer()
+    return True
+
+if __name__ == "__main__":
+    args, qt_args = parse_args(sys.argv)
+    # A second launch hands its request over and exits here, before the
+    # widget classes are imported
+    headless = args.convert or args.export or args.import_notes
+    if not headless and send_to_running_instance(command_from_args(args)):
+        sys.exit(0)
+
+from PyQt5.QtWidgets import (
+    QApplication, QMainWindow, QWidget, QVBoxLayout, QTextEdit, QLabel, QSystemTrayIcon, QMenu, QAction,
+    QPushButton, QHBoxLayout, QInputDialog, QSpinBox, QScrollArea, QFrame, QGridLayout, QMessageBox, QDialog, QCheckBox, QDialogButtonBox, QColorDialog, QToolButton, QSlider, QSizeGrip, QLayout, QLineEdit, QShortcut, QTextBrowser,
+    QToolTip, QListWidget, QListWidgetItem, QListView, QComboBox, QPlainTextEdit
+)
+from PyQt5.QtCore import (
+    Qt, QTimer, QSize, QThread, QAbstractListModel, QModelIndex, QSortFilterProxyModel, QEvent,
+    QFileSystemWatcher, pyqtSignal
+)
+from PyQt5.QtGui import QIcon, QFont, QColor, QPixmap, QPainter, QIntValidator, QLinearGradient, QKeySequence, QPalette, QCursor
+from PyQt5.QtNetwork import QLocalServer, QAbstractSocket
 
 # Pastel color palettes
 LIGHT_PASTELS = [
@@ -42,7 +315,14 @@ DARK_PASTELS = [
 # Helper for icon pixmaps
 ICON_SIZE = 20
 
-def get_icon_pixmap(icon_name, theme='light'):
+def _blank_icon_pixmap(dpr=1.0):
+    # Render at device resolution; painting still uses ICON_SIZE coordinates
+    pix = QPixmap(int(ICON_SIZE * dpr), int(ICON_SIZE * dpr))
+    pix.setDevicePixelRatio(dpr)
+    pix.fill(Qt.transparent)
+    return pix
+
+def get_icon_pixmap(icon_name, theme='light', dpr=1.0):
     # Use built-in Qt icons or draw simple SVGs for palette/color
     if icon_name == 'add':
         return QApplication.style().standardIcon(QApplication.style().SP_FileDialogNewFolder).pixmap(ICON_SIZE, ICON_SIZE)
@@ -52,8 +332,7 @@ def get_icon_pixmap(icon_name, theme='light'):
         return QApplication.style().standardIcon(QApplication.style().SP_TrashIcon).pixmap(ICON_SIZE, ICON_SIZE)
     elif icon_name == 'eye':
         # Draw a simple eye icon
-        pix = QPixmap(ICON_SIZE, ICON_SIZE)
-        pix.fill(Qt.transparent)
+        pix = _blank_icon_pixmap(dpr)
         p = QPainter(pix)
         p.setPen(Qt.black if theme == 'light' else Qt.white)
         p.drawEllipse(3, 7, 14, 6)
@@ -62,8 +341,7 @@ def get_icon_pixmap(icon_name, theme='light'):
         return pix
     elif icon_name == 'eye-off':
         # Draw a simple eye-off icon
-        pix = QPixmap(ICON_SIZE, ICON_SIZE)
-        pix.fill(Qt.transparent)
+        pix = _blank_icon_pixmap(dpr)
         p = QPainter(pix)
         p.setPen(Qt.black if theme == 'light' else Qt.white)
         p.drawEllipse(3, 7, 14, 6)
@@ -73,8 +351,7 @@ def get_icon_pixmap(icon_name, theme='light'):
         return pix
     elif icon_name == 'minimize':
         # Draw a simple minimize icon (horizontal line)
-        pix = QPixmap(ICON_SIZE, ICON_SIZE)
-        pix.fill(Qt.transparent)
+        pix = _blank_icon_pixmap(dpr)
         p = QPainter(pix)
         p.setPen(Qt.black if theme == 'light' else Qt.white)
         p.setBrush(Qt.black if theme == 'light' else Qt.white)
@@ -83,8 +360,7 @@ def get_icon_pixmap(icon_name, theme='light'):
         return pix
     elif icon_name == 'palette':
         # Draw a color gradient square
-        pix = QPixmap(ICON_SIZE, ICON_SIZE)
-        pix.fill(Qt.transparent)
+        pix = _blank_icon_pixmap(dpr)
         p = QPainter(pix)
         if theme == 'light':
             grad = QLinearGradient(0, 0, ICON_SIZE, ICON_SIZE)
@@ -101,8 +377,7 @@ def get_icon_pixmap(icon_name, theme='light'):
         return pix
     elif icon_name == 'settings':
         # Draw a simple macOS-style gear
-        pix = QPixmap(ICON_SIZE, ICON_SIZE)
-        pix.fill(Qt.transparent)
+        pix = _blank_icon_pixmap(dpr)
         p = QPainter(pix)
         p.setRenderHint(QPainter.Antialiasing)
         color = Qt.black if theme == 'light' else Qt.white
@@ -123,8 +398,7 @@ def get_icon_pixmap(icon_name, theme='light'):
         return pix
     elif icon_name == 'delete':
         # Draw an X in a circle
-        pix = QPixmap(ICON_SIZE, ICON_SIZE)
-        pix.fill(Qt.transparent)
+        pix = _blank_icon_pixmap(dpr)
         p = QPainter(pix)
         color = Qt.black if theme == 'light' else Qt.white
         p.setPen(color)
@@ -134,87 +408,2269 @@ def get_icon_pixmap(icon_name, theme='light'):
         p.drawLine(ICON_SIZE-5, 5, 5, ICON_SIZE-5)
         p.end()
         return pix
-    return QPixmap(ICON_SIZE, ICON_SIZE)
+    return _blank_icon_pixmap(dpr)
+
+def get_pastel_palette(theme):
+    return LIGHT_PASTELS if theme == 'light' else DARK_PASTELS
+
+def get_contrast_font_color(bg_rgb):
+    # Use black for light backgrounds, white for dark
+    r, g, b = bg_rgb
+    luminance = (0.299*r + 0.587*g + 0.114*b)
+    return '#000' if luminance > 150 else '#fff'
+
+def create_sticky_note_icon(theme='light', dpr=1.0):
+    # Create a sticky note icon
+    pix = _blank_icon_pixmap(dpr)
+    p = QPainter(pix)
+    
+    # Set up colors based on theme
+    if theme == 'light':
+        note_color = QColor(255, 255, 150)  # Light yellow
+        border_color = QColor(200, 200, 100)
+        line_color = QColor(180, 180, 80)
+    else:
+        note_color = QColor(80, 80, 40)  # Dark yellow
+        border_color = QColor(100, 100, 50)
+        line_color = QColor(120, 120, 60)
+    
+    # Draw the main note shape
+    p.setPen(border_color)
+    p.setBrush(note_color)
+    p.drawRect(2, 2, 16, 16)
+    
+    # Draw lines to make it look like paper
+    p.setPen(line_color)
+    p.drawLine(4, 8, 16, 8)
+    p.drawLine(4, 12, 16, 12)
+    p.drawLine(4, 16, 16, 16)
+    
+    p.end()
+    return pix
+
+def new_note_id():
+    return uuid.uuid4().hex
+
+def _common_prefix_len(a, b):
+    # Binary search over slice equality keeps the comparisons in C
+    lo, hi = 0, min(len(a), len(b))
+    while lo < hi:
+        mid = (lo + hi + 1) // 2
+        if a[:mid] == b[:mid]:
+            lo = mid
+        else:
+            hi = mid - 1
+    return lo
+
+def _common_suffix_len(a, b, limit):
+    lo, hi = 0, limit
+    while lo < hi:
+        mid = (lo + hi + 1) // 2
+        if a[len(a) - mid:] == b[len(b) - mid:]:
+            lo = mid
+        else:
+            hi = mid - 1
+    return lo
+
+def text_splice(old, new):
+    """Return (start, end, text, old_len) turning old into new."""
+    start = _common_prefix_len(old, new)
+    tail = _common_suffix_len(old, new, min(len(old), len(new)) - start)
+    return [start, len(old) - tail, new[start:len(new) - tail], len(old)]
+
+def apply_text_splice(old, splice):
+    start, end, text, old_len = splice
+    if len(old) != old_len:
+        raise ValueError("splice does not match the note content")
+    return old[:start] + text + old[end:]
+
+class JournalStore:
+    """JSON snapshot plus an append-only journal of per-note deltas.
+
+    The journal is folded into a fresh snapshot past JOURNAL_COMPACT_BYTES.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.journal_path = path + JOURNAL_SUFFIX
+        self._gen = 0
+        self._theme = None
+        self._persisted = {}
+        self._journal_size = 0
+        self._snapshot_signature = None
+        self._needs_compaction = False
+        # Where load() last moved a damaged save file
+        self.recovered = None
+
+    def load(self):
+        """Return (theme, notes) as stored on disk, replaying the journal."""
+        theme = self._load()
+        return theme, [dict(note) for note in self._persisted.values()]
+
+    def iter_notes(self):
+        """Yield the saved notes one at a time.
+
+        The JSON snapshot can only be parsed whole, so unlike the other
+        stores this holds every note (large bodies are in their own files).
+        """
+        self._load()
+        for note in list(self._persisted.values()):
+            yield dict(note)
+
+    def read(self):
+        """Return (theme, notes) as stored, without repairing or moving anything.
+
+        Unlike load(), a damaged save file raises ValueError.
+        """
+        data = self._read_snapshot() if os.path.exists(self.path) else {}
+        theme = data.get("theme", "dark")
+        notes = {}
+        for note in data.get("notes", []):
+            notes[note.setdefault("id", new_note_id())] = note
+        if os.path.exists(self.journal_path):
+            theme, _ = self._replay_journal(data.get("gen", 0), theme, notes)
+        return theme, list(notes.values())
+
+    def _read_snapshot(self):
+        with open(self.path, 'r') as f:
+            data = json.load(f)
+        if not isinstance(data, dict):
+            raise ValueError(f"{self.path} is not a sticky notes save file")
+        return data
+
+    def get(self, note_id):
+        """Return the saved note with this id, or None."""
+        if self._theme is None:
+            self._load()
+        note = self._persisted.get(note_id)
+        return dict(note) if note is not None else None
+
+    def _load(self):
+        theme = "dark"
+        notes = {}
+        gen = 0
+        if os.path.exists(self.path):
+            try:
+                data = self._read_snapshot()
+            except ValueError:
+                # Keep the damaged file for inspection instead of overwriting it
+                broken = self.path + ".corrupt"
+                os.replace(self.path, broken)
+                logger.error("Error loading notes: %s is corrupt, moved to %s", self.path, broken)
+                self.recovered = broken
+                data = {}
+            theme = data.get("theme", theme)
+            gen = data.get("gen", 0)
+            for note in data.get("notes", []):
+                if "id" not in note:
+                    note["id"] = new_note_id()
+                    self._needs_compaction = True
+                notes[note["id"]] = note
+        self._journal_size = 0
+        if os.path.exists(self.journal_path):
+            size = os.path.getsize(self.journal_path)
+            theme, complete = self._replay_journal(gen, theme, notes)
+            if complete:
+                self._journal_size = size
+            else:
+                # Records appended after a stale header or a torn line would
+                # be skipped on the next load too; start a fresh generation
+                self._needs_compaction = True
+        self._gen = gen
+        self._theme = theme
+        self._persisted = notes
+        self._snapshot_signature = files_signature((self.path,))
+        return theme
+
+    def refresh(self):
+        """Re-read the notes after another process changed them.
+
+        When the snapshot is unchanged and the journal only grew, just the
+        appended records are parsed; otherwise this is a full load().
+        """
+        if (self._journal_size == 0 or self._snapshot_signature is None
+                or files_signature((self.path,)) != self._snapshot_signature):
+            return self.load()
+        try:
+            with open(self.journal_path, 'rb') as f:
+                f.seek(self._journal_size)
+                tail = f.read()
+        except OSError:
+            return self.load()
+        if os.path.getsize(self.journal_path) < self._journal_size:
+            return self.load()
+        theme = self._theme
+        notes = {note_id: dict(note) for note_id, note in self._persisted.items()}
+        consumed = 0
+        for line in tail.decode("utf-8").splitlines(True):
+            if not line.endswith("\n"):
+                # Still being appended; picked up on the next change
+                break
+            try:
+                theme = self._apply_record(json.loads(line), theme, notes)
+            except (ValueError, KeyError):
+                break
+            consumed += len(line)
+        self._journal_size += consumed
+        self._theme = theme
+        self._persisted = notes
+        return theme, [dict(note) for note in notes.values()]
+
+    def _replay_journal(self, gen, theme, notes):
+        """Apply the journal to notes; return (theme, whether all of it applied)."""
+        with open(self.journal_path, 'r') as f:
+            lines = iter(f)
+            try:
+                header = json.loads(next(lines))
+            except (StopIteration, ValueError):
+                return theme, False
+            if header.get("gen") != gen:
+                return theme, False
+            for line in lines:
+                if not line.endswith("\n"):
+                    # A crash before the newline; the next append would
+                    # run on into this line, so treat it as torn
+                    return theme, False
+                try:
+                    record = json.loads(line)
+                    theme = self._apply_record(record, theme, notes)
+                except (ValueError, KeyError):
+                    # A torn final line from a crash mid-append; stop here
+                    return theme, False
+        return theme, True
+
+    @staticmethod
+    def _apply_record(record, theme, notes):
+        op = record["op"]
+        if op == "theme":
+            return record["theme"]
+        if op == "put":
+            notes[record["id"]] = dict(record["data"])
+        elif op == "set":
+            note = notes[record["id"]]
+            note.update(record.get("fields", {}))
+            for key in record.get("unset", ()):
+                note.pop(key, None)
+            if "splice" in record:
+                note["content"] = apply_text_splice(note.get("content", ""), record["splice"])
+        elif op == "del":
+            notes.pop(record["id"], None)
+        elif op == "order":
+            reordered = {note_id: notes[note_id] for note_id in record["ids"] if note_id in notes}
+            reordered.update(notes)
+            notes.clear()
+            notes.update(reordered)
+        return theme
+
+    def diff(self, theme, notes):
+        """Return the journal records that turn the persisted state into this one."""
+        records = []
+        if theme != self._theme:
+            records.append({"op": "theme", "theme": theme})
+        seen = set()
+        for note in notes:
+            note_id = note["id"]
+            seen.add(note_id)
+            old = self._persisted.get(note_id)
+            if old is None:
+                records.append({"op": "put", "id": note_id, "data": note})
+                continue
+            fields = {k: v for k, v in note.items() if k != "content" and old.get(k) != v}
+            record = {"op": "set", "id": note_id}
+            if fields:
+                record["fields"] = fields
+            unset = [k for k in old if k not in note]
+            if unset:
+                record["unset"] = unset
+            old_content = old.get("content", "")
+            new_content = note.get("content", "")
+            if old_content != new_content:
+                record["splice"] = text_splice(old_content, new_content)
+            if len(record) > 2:
+                records.append(record)
+        for note_id in self._persisted:
+            if note_id not in seen:
+                records.append({"op": "del", "id": note_id})
+        expected = [i for i in self._persisted if i in seen]
+        expected += [note["id"] for note in notes if note["id"] not in self._persisted]
+        ids = [note["id"] for note in notes]
+        if ids != expected:
+            records.append({"op": "order", "ids": ids})
+        return records
+
+    def write(self, theme, notes):
+        records = self.diff(theme, notes)
+        if not records and not self._needs_compaction:
+            return
+        self._append(records, theme, notes)
+        self._theme = theme
+        self._persisted = {note["id"]: note for note in notes}
+
+    def upsert(self, notes):
+        """Add or replace notes, keeping the others; new ones go last."""
+        if self._theme is None:
+            self._load()
+        records = []
+        for note in notes:
+            records.append({"op": "put", "id": note["id"], "data": note})
+            self._persisted[note["id"]] = note
+        if records:
+            self._append(records, self._theme, list(self._persisted.values()))
+
+    def _append(self, records, theme, notes):
+        payload = "".join(json.dumps(record) + "\n" for record in records)
+        if self._needs_compaction or self._journal_size + len(payload) > JOURNAL_COMPACT_BYTES:
+            self.compact(theme, notes)
+        else:
+            if self._journal_size == 0:
+                payload = json.dumps({"gen": self._gen}) + "\n" + payload
+            with open(self.journal_path, 'a') as f:
+                f.write(payload)
+                f.flush()
+                os.fsync(f.fileno())
+            # json.dumps escapes to ASCII, so characters are bytes
+            self._journal_size += len(payload)
+            metrics.count("bytes_written", len(payload))
+
+    def paths(self):
+        return (self.path, self.journal_path)
+
+    def compact(self, theme, notes):
+        gen = self._gen + 1
+        _atomic_write(self.path, json.dumps({"theme": theme, "gen": gen, "notes": list(notes)}))
+        # A crash from here on leaves a journal of the old generation, which
+        # load() ignores because the snapshot already contains it.
+        header = json.dumps({"gen": gen}) + "\n"
+        _atomic_write(self.journal_path, header)
+        self._gen = gen
+        self._journal_size = len(header)
+        self._snapshot_signature = files_signature((self.path,))
+        self._needs_compaction = False
+
+    def close(self):
+        pass
+
+class FileLock:
+    """Exclusive advisory lock on a file, for use as a context manager.
+
+    flock() covers other processes; the thread lock covers the GUI thread
+    and the save worker of this one, which flock() would only serialise if
+    they opened the file separately.
+    """
+
+    _thread_locks = {}
+
+    def __init__(self, path):
+        self.path = path
+        self._thread_lock = self._thread_locks.setdefault(path, threading.Lock())
+        self._file = None
+
+    def __enter__(self):
+        self._thread_lock.acquire()
+        if fcntl is not None:
+            try:
+                self._file = open(self.path, 'a')
+                fcntl.flock(self._file.fileno(), fcntl.LOCK_EX)
+            except OSError as e:
+                logger.warning("Could not lock %s: %s", self.path, e)
+        return self
+
+    def __exit__(self, *exc):
+        if self._file is not None:
+            # Closing the file drops the lock
+            self._file.close()
+            self._file = None
+        self._thread_lock.release()
+        return False
+
+def files_signature(paths):
+    """Identity of the current contents of paths, cheap enough to poll."""
+    signature = []
+    for path in paths:
+        try:
+            st = os.stat(path)
+        except OSError:
+            signature.append(None)
+        else:
+            signature.append((st.st_ino, st.st_size, st.st_mtime_ns))
+    return tuple(signature)
+
+def _atomic_write(path, text):
+    tmp_path = path + ".tmp"
+    with open(tmp_path, 'w') as f:
+        f.write(text)
+        f.flush()
+        os.fsync(f.fileno())
+        metrics.count("bytes_written", os.fstat(f.fileno()).st_size)
+    os.replace(tmp_path, path)
+    try:
+        dir_fd = os.open(os.path.dirname(path) or ".", os.O_RDONLY)
+    except OSError:
+        return
+    try:
+        os.fsync(dir_fd)
+    except OSError:
+        pass
+    finally:
+        os.close(dir_fd)
+
+class SqliteStore:
+    """Notes stored as one SQLite row each, keyed by the note id.
+
+    Writes only touch rows whose data or position changed, inside a single
+    WAL-mode transaction, so other processes can keep reading meanwhile. An
+    existing JSON save file is imported once on first use.
+    """
+
+    COLUMNS = ("id", "position", "title", "content", "font_size", "is_visible",
+               "color_index", "width", "height", "x", "y", "blob")
+
+    def __init__(self, path, json_path=None):
+        self.path = path
+        self.json_path = json_path
+        self._conn = None
+        self._lock = threading.Lock()
+        self._theme = None
+        self._persisted = {}
+        self._positions = {}
+        self.recovered = None
+
+    def paths(self):
+        return (self.path, self.path + "-wal")
+
+    def refresh(self):
+        # Rows are cheap to re-read; writes only touch the ones that differ
+        return self.load()
+
+    def _connect(self):
+        if self._conn is None:
+            # Loads happen on the GUI thread, writes on the save worker; the
+            # lock keeps them from ever overlapping.
+            self._conn = sqlite3.connect(self.path, check_same_thread=False)
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute("PRAGMA synchronous=NORMAL")
+            with self._conn:
+                self._conn.execute(
+                    "CREATE TABLE IF NOT EXISTS notes ("
+                    "id TEXT PRIMARY KEY, position INTEGER NOT NULL, title TEXT NOT NULL, "
+                    "content TEXT NOT NULL, font_size INTEGER, is_visible INTEGER, "
+                    "color_index INTEGER, width INTEGER, height INTEGER, x INTEGER, y INTEGER, blob TEXT)")
+                self._conn.execute("CREATE INDEX IF NOT EXISTS notes_position ON notes(position)")
+                self._conn.execute("CREATE INDEX IF NOT EXISTS notes_title ON notes(title)")
+                self._conn.execute("CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT)")
+        return self._conn
+
+    @staticmethod
+    def _to_row(note, position):
+        size = note.get("size") or [None, None]
+        pos = note.get("pos") or [None, None]
+        return (note["id"], position, note.get("title", ""), note.get("content", ""),
+                note.get("font_size", DEFAULT_FONT_SIZE), int(note.get("is_visible", True)),
+                note.get("color_index", 0), size[0], size[1], pos[0], pos[1], note.get("blob"))
+
+    @staticmethod
+    def _from_row(row):
+        note_id, _, title, content, font_size, is_visible, color_index, width, height, x, y, blob = row
+        note = {
+            "id": note_id,
+            "title": title,
+            "content": content,
+            "font_size": font_size,
+            "is_visible": bool(is_visible),
+            "color_index": color_index,
+        }
+        if width is not None:
+            note["size"] = [width, height]
+        if x is not None:
+            note["pos"] = [x, y]
+        if blob:
+            note["blob"] = blob
+        return note
+
+    def _get_meta(self, key, default=None):
+        row = self._conn.execute("SELECT value FROM meta WHERE key = ?", (key,)).fetchone()
+        return row[0] if row else default
+
+    def _set_meta(self, key, value):
+        self._conn.execute("INSERT OR REPLACE INTO meta (key, value) VALUES (?, ?)", (key, value))
+
+    def _import_json(self):
+        theme, notes = JournalStore(self.json_path).load()
+        with self._conn:
+            self._conn.executemany(
+                f"INSERT OR REPLACE INTO notes VALUES ({', '.join('?' * len(self.COLUMNS))})",
+                [self._to_row(note, i) for i, note in enumerate(notes)])
+            self._set_meta("theme", theme)
+            self._set_meta("json_imported", "1")
+
+    def _prepare(self):
+        conn = self._connect()
+        if self._get_meta("json_imported") is None:
+            if self.json_path and os.path.exists(self.json_path):
+                self._import_json()
+            else:
+                with conn:
+                    self._set_meta("json_imported", "0")
+        return conn
+
+    def iter_notes(self):
+        """Yield the saved notes in order, one row at a time."""
+        with self._lock:
+            cursor = self._prepare().execute(
+                f"SELECT {', '.join(self.COLUMNS)} FROM notes ORDER BY position")
+            for row in cursor:
+                yield self._from_row(row)
+
+    def get(self, note_id):
+        """Return the saved note with this id, or None."""
+        with self._lock:
+            row = self._prepare().execute(
+                f"SELECT {', '.join(self.COLUMNS)} FROM notes WHERE id = ?", (note_id,)).fetchone()
+        return self._from_row(row) if row else None
+
+    def upsert(self, notes):
+        """Add or replace notes, keeping the others; new ones go last."""
+        with self._lock:
+            conn = self._prepare()
+            (end,) = conn.execute("SELECT COALESCE(MAX(position) + 1, 0) FROM notes").fetchone()
+            rows = []
+            for note in notes:
+                row = conn.execute("SELECT position FROM notes WHERE id = ?", (note["id"],)).fetchone()
+                if row is None:
+                    row = (end,)
+                    end += 1
+                rows.append(self._to_row(note, row[0]))
+                self._persisted[note["id"]] = note
+                self._positions[note["id"]] = row[0]
+            with conn:
+                conn.executemany(
+                    f"INSERT OR REPLACE INTO notes VALUES ({', '.join('?' * len(self.COLUMNS))})", rows)
+
+    def load(self):
+        with self._lock:
+            conn = self._prepare()
+            theme = self._get_meta("theme", "dark")
+            rows = conn.execute(
+                f"SELECT {', '.join(self.COLUMNS)} FROM notes ORDER BY position").fetchall()
+            notes = [self._from_row(row) for row in rows]
+            self._theme = theme
+            self._persisted = {note["id"]: note for note in notes}
+            self._positions = {row[0]: row[1] for row in rows}
+            return theme, [dict(note) for note in notes]
+
+    def _assign_positions(self, notes):
+        # Saved notes keep their position and new ones go after the last,
+        # so a delete or an append leaves every other row alone. Positions
+        # are only renumbered when the notes were actually reordered.
+        end = max(self._positions.values(), default=-1) + 1
+        positions = []
+        for note in notes:
+            position = self._positions.get(note["id"])
+            if position is None:
+                position = end
+                end += 1
+            positions.append(position)
+        if any(a >= b for a, b in zip(positions, positions[1:])):
+            positions = list(range(len(notes)))
+        return positions
+
+    def write(self, theme, notes):
+        with self._lock:
+            conn = self._connect()
+            positions = self._assign_positions(notes)
+            changed = []
+            moved = []
+            for note, position in zip(notes, positions):
+                if self._persisted.get(note["id"]) != note:
+                    changed.append(self._to_row(note, position))
+                elif self._positions.get(note["id"]) != position:
+                    moved.append((position, note["id"]))
+            current = {note["id"] for note in notes}
+            deleted = [(note_id,) for note_id in self._persisted if note_id not in current]
+            if not changed and not moved and not deleted and theme == self._theme:
+                return
+            with conn:
+                if changed:
+                    conn.executemany(
+                        f"INSERT OR REPLACE INTO notes VALUES ({', '.join('?' * len(self.COLUMNS))})",
+                        changed)
+                if moved:
+                    conn.executemany("UPDATE notes SET position = ? WHERE id = ?", moved)
+                if deleted:
+                    conn.executemany("DELETE FROM notes WHERE id = ?", deleted)
+                if theme != self._theme:
+                    self._set_meta("theme", theme)
+            self._theme = theme
+            self._persisted = {note["id"]: note for note in notes}
+            self._positions = {note["id"]: position for note, position in zip(notes, positions)}
+
+    def close(self):
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+
+# Binary save format (all integers little-endian):
+#   header   magic "SNB1", u16 version, u16 flags, u32 note count, u64 index offset
+#   theme    u16 length + UTF-8
+#   records  u32 meta length + JSON of every field except content,
+#            u8 content flags (1 = zlib), u32 content length + content bytes
+#   index    per note: u16 id length + id, u64 record offset, u32 record length
+BINARY_MAGIC = b"SNB1"
+BINARY_FORMAT_VERSION = 1
+BINARY_HEADER = struct.Struct("<4sHHIQ")
+BINARY_INDEX_ENTRY = struct.Struct("<QI")
+BINARY_COMPRESS_MIN = 256  # bodies shorter than this are stored uncompressed
+CONTENT_ZLIB = 1
+
+def encode_binary_record(note):
+    meta = json.dumps({k: v for k, v in note.items() if k != "content"}).encode("utf-8")
+    content = (note.get("content") or "").encode("utf-8")
+    flags = 0
+    if len(content) >= BINARY_COMPRESS_MIN:
+        packed = zlib.compress(content)
+        if len(packed) < len(content):
+            content = packed
+            flags = CONTENT_ZLIB
+    return b"".join((struct.pack("<I", len(meta)), meta, struct.pack("<BI", flags, len(content)), content))
+
+def _binary_span(buf, offset, length):
+    # A torn or damaged file must fail as ValueError, like a bad JSON file
+    if offset < 0 or length < 0 or offset + length > len(buf):
+        raise ValueError(f"binary save file is truncated or damaged at offset {offset}")
+    return offset + length
+
+def decode_binary_record(buf, offset):
+    _binary_span(buf, offset, 4)
+    (meta_len,) = struct.unpack_from("<I", buf, offset)
+    offset += 4
+    end = _binary_span(buf, offset, meta_len)
+    note = json.loads(bytes(buf[offset:end]).decode("utf-8"))
+    if not isinstance(note, dict):
+        raise ValueError(f"binary save file has a damaged record at offset {offset}")
+    offset = end
+    _binary_span(buf, offset, 5)
+    flags, content_len = struct.unpack_from("<BI", buf, offset)
+    offset += 5
+    content = bytes(buf[offset:_binary_span(buf, offset, content_len)])
+    if flags & CONTENT_ZLIB:
+        try:
+            content = zlib.decompress(content)
+        except zlib.error as e:
+            raise ValueError(f"binary save file has a damaged note body: {e}")
+    note["content"] = content.decode("utf-8")
+    return note
+
+def write_binary_notes(path, theme, notes, encoded=None):
+    """Atomically write notes in the binary format.
+
+    encoded may map note ids to already encoded records, which are reused
+    as-is instead of being serialised and compressed again.
+    """
+    write_binary_records(path, theme, (
+        (note["id"], (encoded.get(note["id"]) if encoded else None) or encode_binary_record(note))
+        for note in notes))
+
+def write_binary_records(path, theme, records):
+    """Atomically write (note id, encoded record) pairs as a binary save file.
+
+    Records are written as they come; only the index is kept until the end.
+    """
+    theme_bytes = theme.encode("utf-8")
+    offset = BINARY_HEADER.size + 2 + len(theme_bytes)
+    index = []
+    tmp_path = path + ".tmp"
+    with open(tmp_path, 'wb') as f:
+        # The header needs the index offset, so it is filled in last
+        f.write(bytes(BINARY_HEADER.size))
+        f.write(struct.pack("<H", len(theme_bytes)) + theme_bytes)
+        for note_id, record in records:
+            f.write(record)
+            index.append((note_id, offset, len(record)))
+            offset += len(record)
+        for note_id, record_offset, length in index:
+            id_bytes = note_id.encode("utf-8")
+            f.write(struct.pack("<H", len(id_bytes)) + id_bytes + BINARY_INDEX_ENTRY.pack(record_offset, length))
+        f.seek(0)
+        f.write(BINARY_HEADER.pack(BINARY_MAGIC, BINARY_FORMAT_VERSION, 0, len(index), offset))
+        f.flush()
+        os.fsync(f.fileno())
+        metrics.count("bytes_written", os.fstat(f.fileno()).st_size)
+    os.replace(tmp_path, path)
+
+class BinaryNoteFile:
+    """Read-only view of a binary save file.
+
+    The file is memory-mapped and only the header and index are parsed up
+    front, so a single note can be read without decoding any other.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._file = open(path, 'rb')
+        try:
+            self._map = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        except ValueError:
+            # Empty file; mmap cannot map zero bytes
+            self._file.close()
+            raise ValueError(f"{path} is not a sticky notes binary file")
+        try:
+            self._read_index()
+        except ValueError:
+            self.close()
+            raise
+
+    def _read_index(self):
+        buf = self._map
+        if len(buf) < BINARY_HEADER.size or bytes(buf[:len(BINARY_MAGIC)]) != BINARY_MAGIC:
+            raise ValueError(f"{self.path} is not a sticky notes binary file")
+        magic, version, _flags, count, index_offset = BINARY_HEADER.unpack_from(buf, 0)
+        if version > BINARY_FORMAT_VERSION:
+            raise ValueError(f"{self.path} uses format version {version}, newer than this app supports")
+        self.version = version
+        start = _binary_span(buf, BINARY_HEADER.size, 2)
+        (theme_len,) = struct.unpack_from("<H", buf, BINARY_HEADER.size)
+        self.theme = bytes(buf[start:_binary_span(buf, start, theme_len)]).decode("utf-8")
+        records_start = start + theme_len
+        self.index = {}
+        pos = index_offset
+        for _ in range(count):
+            _binary_span(buf, pos, 2)
+            (id_len,) = struct.unpack_from("<H", buf, pos)
+            pos += 2
+            note_id = bytes(buf[pos:_binary_span(buf, pos, id_len)]).decode("utf-8")
+            pos += id_len
+            _binary_span(buf, pos, BINARY_INDEX_ENTRY.size)
+            offset, length = BINARY_INDEX_ENTRY.unpack_from(buf, pos)
+            if offset < records_start or offset + length > index_offset:
+                raise ValueError(f"{self.path} has a damaged index entry for note {note_id}")
+            self.index[note_id] = (offset, length)
+            pos += BINARY_INDEX_ENTRY.size
+
+    def raw_record(self, note_id):
+        offset, length = self.index[note_id]
+        return bytes(self._map[offset:offset + length])
+
+    def read_note(self, note_id):
+        return decode_binary_record(self._map, self.index[note_id][0])
+
+    def iter_notes(self):
+        for offset, _ in self.index.values():
+            yield decode_binary_record(self._map, offset)
+
+    def close(self):
+        if getattr(self, "_map", None) is not None:
+            self._map.close()
+            self._map = None
+        self._file.close()
+
+class BinaryStore:
+    """Notes kept in the compact binary format.
+
+    Every change rewrites the file atomically, but records of unchanged
+    notes are copied from the previous write instead of being serialised
+    and compressed again.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._theme = None
+        self._persisted = {}
+        self._encoded = {}
+        # Kept open between get() calls; any write drops it
+        self._reader = None
+        self.recovered = None
+
+    def paths(self):
+        return (self.path,)
+
+    def _close_reader(self):
+        if self._reader is not None:
+            self._reader.close()
+            self._reader = None
+
+    def get(self, note_id):
+        """Return the saved note with this id, or None, decoding only its record."""
+        if self._reader is None:
+            if not os.path.exists(self.path):
+                return None
+            self._reader = BinaryNoteFile(self.path)
+        if note_id not in self._reader.index:
+            return None
+        return self._reader.read_note(note_id)
+
+    def refresh(self):
+        # Only the index is parsed; note records are decoded on demand
+        return self.load()
+
+    def iter_notes(self):
+        """Yield the saved notes, decoding one record at a time."""
+        if not os.path.exists(self.path):
+            return
+        reader = BinaryNoteFile(self.path)
+        try:
+            yield from reader.iter_notes()
+        finally:
+            reader.close()
+
+    def upsert(self, notes):
+        """Add or replace notes, keeping the others; new ones go last.
+
+        The other records are copied over from the current file as-is.
+        """
+        self._close_reader()
+        changes = {note["id"]: note for note in notes}
+        reader = BinaryNoteFile(self.path) if os.path.exists(self.path) else None
+        try:
+            def records():
+                if reader is not None:
+                    for note_id in reader.index:
+                        note = changes.pop(note_id, None)
+                        yield note_id, encode_binary_record(note) if note else reader.raw_record(note_id)
+                for note_id, note in changes.items():
+                    yield note_id, encode_binary_record(note)
+            theme = reader.theme if reader is not None else self._theme or "dark"
+            for note in changes.values():
+                self._persisted[note["id"]] = note
+                self._encoded.pop(note["id"], None)
+            write_binary_records(self.path, theme, records())
+        finally:
+            if reader is not None:
+                reader.close()
+
+    def load(self):
+        self._close_reader()
+        theme = "dark"
+        notes = []
+        self._encoded = {}
+        if os.path.exists(self.path):
+            try:
+                reader = BinaryNoteFile(self.path)
+                try:
+                    theme = reader.theme
+                    for note_id in reader.index:
+                        notes.append(reader.read_note(note_id))
+                        self._encoded[note_id] = reader.raw_record(note_id)
+                finally:
+                    reader.close()
+            except ValueError as e:
+                if binary_file_version(self.path) > BINARY_FORMAT_VERSION:
+                    # Not damaged, just newer; leave it alone
+                    raise
+                # Keep the damaged file for inspection instead of overwriting it
+                broken = self.path + ".corrupt"
+                os.replace(self.path, broken)
+                logger.error("Error loading notes: %s (moved to %s)", e, broken)
+                self.recovered = broken
+                theme = "dark"
+                notes = []
+                self._encoded = {}
+        self._theme = theme
+        self._persisted = {note["id"]: note for note in notes}
+        return theme, [dict(note) for note in notes]
+
+    def write(self, theme, notes):
+        ids = [note["id"] for note in notes]
+        if (theme == self._theme and ids == list(self._persisted)
+                and all(self._persisted[note["id"]] == note for note in notes)):
+            return
+        self._close_reader()
+        encoded = {}
+        for note in notes:
+            record = self._encoded.get(note["id"])
+            if record is None or self._persisted.get(note["id"]) != note:
+                record = encode_binary_record(note)
+            encoded[note["id"]] = record
+        write_binary_notes(self.path, theme, notes, encoded)
+        self._theme = theme
+        self._persisted = {note["id"]: note for note in notes}
+        self._encoded = encoded
+
+    def close(self):
+        self._close_reader()
+
+def binary_file_version(path):
+    """Format version in the header of a binary save file, 0 if unreadable."""
+    with open(path, 'rb') as f:
+        head = f.read(BINARY_HEADER.size)
+    if len(head) < BINARY_HEADER.size or not head.startswith(BINARY_MAGIC):
+        return 0
+    return BINARY_HEADER.unpack(head)[1]
+
+def is_binary_save_file(path):
+    with open(path, 'rb') as f:
+        return f.read(len(BINARY_MAGIC)) == BINARY_MAGIC
+
+def convert_save_file(src, dst):
+    """Convert between the JSON save file and the binary format, either way.
+
+    The direction follows the source file. Every note field is carried over
+    unchanged; a JSON source is read with its journal replayed. The source
+    is never modified: if it is damaged, ValueError is raised and dst is
+    not written.
+    """
+    if is_binary_save_file(src):
+        reader = BinaryNoteFile(src)
+        try:
+            data = {"theme": reader.theme, "notes": list(reader.iter_notes())}
+        finally:
+            reader.close()
+        _atomic_write(dst, json.dumps(data))
+        # A journal left over from an earlier save file would replay on top
+        if os.path.exists(dst + JOURNAL_SUFFIX):
+            os.remove(dst + JOURNAL_SUFFIX)
+    else:
+        theme, notes = JournalStore(src).read()
+        write_binary_notes(dst, theme, notes)
+
+# Headless bulk export and import. Notes are streamed one at a time: the
+# exported files are written as the notes are read from the store, and an
+# import keeps only the id and title of each saved note plus a bounded
+# batch of the notes it adds or changes, with large bodies going straight
+# to their blob file. The store writes each batch as it fills (upsert).
+# The JSON store is the exception, as its snapshot can only be parsed whole.
+
+EXCHANGE_FORMATS = ("jsonl", "markdown")
+IMPORT_BATCH_SIZE = 500  # imported notes held before they are written to the store
+MARKDOWN_FIELDS = ("id", "title", "font_size", "is_visible", "color_index", "size", "pos")
+
+def _read_blob(name):
+    # Not NoteBlobs.read(), which keeps every body it reads
+    with open(os.path.join(BLOB_DIR, name), 'r') as f:
+        return f.read()
+
+def _iter_saved_notes():
+    """Yield the saved notes with their bodies inline, one at a time."""
+    store = open_store()
+    try:
+        # Held throughout, so the notes all come from one version of the file
+        with FileLock(LOCK_FILE):
+            for note in store.iter_notes():
+                if note.get("blob"):
+                    try:
+                        content = _read_blob(note["blob"])
+                    except OSError as e:
+                        # Same as load_note_body(): keep the note, lose the body
+                        logger.error("Error loading note body: %s", e)
+                        content = ""
+                    note = dict(note, content=content)
+                    del note["blob"]
+                yield note
+    finally:
+        store.close()
+
+def note_to_markdown(note):
+    # Front matter values are JSON, so they read back with their types
+    lines = ["---"]
+    lines += [f"{key}: {json.dumps(note[key])}" for key in MARKDOWN_FIELDS if note.get(key) is not None]
+    lines.append("---")
+    return "\n".join(lines) + "\n" + (note.get("content") or "")
+
+def note_from_markdown(text, fallback_title):
+    note = {}
+    if text.startswith("---\n"):
+        end = text.find("\n---\n", 3)
+        if end != -1:
+            for line in text[4:end].splitlines():
+                key, sep, value = line.partition(": ")
+                if sep and key in MARKDOWN_FIELDS:
+                    try:
+                        note[key] = json.loads(value)
+                    except ValueError:
+                        note[key] = value
+            text = text[end + 5:]
+    note.setdefault("title", fallback_title)
+    note["content"] = text
+    return note
+
+def _markdown_file_name(note):
+    slug = re.sub(r"[^A-Za-z0-9]+", "-", note.get("title", "")).strip("-")[:40] or "note"
+    return f"{slug}-{note['id'][:8]}.md"
+
+def export_notes(fmt, path):
+    """Write every saved note to path as JSONL or a Markdown directory."""
+    count = 0
+    if fmt == "jsonl":
+        with open(path, 'w') as f:
+            for note in _iter_saved_notes():
+                f.write(json.dumps(note) + "\n")
+                count += 1
+    elif fmt == "markdown":
+        os.makedirs(path, exist_ok=True)
+        for note in _iter_saved_notes():
+            with open(os.path.join(path, _markdown_file_name(note)), 'w') as f:
+                f.write(note_to_markdown(note))
+            count += 1
+    else:
+        raise ValueError(f"unknown format {fmt!r}, expected one of {', '.join(EXCHANGE_FORMATS)}")
+    return count
+
+def _iter_import_file(fmt, path):
+    if fmt == "jsonl":
+        with open(path, 'r') as f:
+            for line in f:
+                if line.strip():
+                    yield json.loads(line)
+    elif fmt == "markdown":
+        for name in sorted(os.listdir(path)):
+            if name.endswith(".md"):
+                with open(os.path.join(path, name), 'r') as f:
+                    yield note_from_markdown(f.read(), name[:-3])
+    else:
+        raise ValueError(f"unknown format {fmt!r}, expected one of {', '.join(EXCHANGE_FORMATS)}")
+
+def import_notes(fmt, path, merge_by="id"):
+    """Merge notes from a JSONL file or Markdown directory into the save file.
+
+    An imported note replaces the fields of the saved note with the same id
+    (or title, with merge_by="title"); anything else is added at the end.
+    Returns (added, updated).
+    """
+    store = open_store()
+    blobs = NoteBlobs(BLOB_DIR)
+    added = updated = 0
+    # Whole notes, new or merged with the saved one, until the next upsert
+    batch = {}
+
+    def write_batch():
+        written, _ = blobs.externalise(batch.values())
+        store.upsert(written)
+        batch.clear()
+
+    with FileLock(LOCK_FILE):
+        titles = {note["id"]: note.get("title", "") for note in store.iter_notes()}
+        by_title = {}
+        if merge_by == "title":
+            for note_id, title in titles.items():
+                by_title.setdefault(title, note_id)
+        for incoming in _iter_import_file(fmt, path):
+            incoming.pop("blob", None)
+            if merge_by == "title":
+                note_id = by_title.get(incoming.get("title", ""))
+            else:
+                note_id = incoming.get("id")
+            if note_id in titles:
+                saved = batch.get(note_id) or store.get(note_id)
+                if saved.get("blob"):
+                    # Keep pointing at the existing file (see NoteBlobs)
+                    saved = dict(saved, content=None)
+                note = dict(saved, **incoming)
+                note["id"] = note_id
+                updated += 1
+            else:
+                note_id = incoming.get("id")
+                if not note_id or note_id in titles:
+                    note_id = new_note_id()
+                note = dict(incoming, id=note_id)
+                titles[note_id] = note.get("title", "")
+                by_title.setdefault(titles[note_id], note_id)
+                added += 1
+            content = note.get("content")
+            if content is not None and len(content) > LARGE_NOTE_CHARS:
+                name = NoteBlobs.name_for(note_id)
+                os.makedirs(BLOB_DIR, exist_ok=True)
+                _atomic_write(os.path.join(BLOB_DIR, name), content)
+                note = dict(note, content=None, blob=name)
+            batch[note_id] = note
+            if len(batch) >= IMPORT_BATCH_SIZE:
+                write_batch()
+        if batch:
+            write_batch()
+    store.close()
+    return added, updated
+
+def open_store():
+    if STORAGE_BACKEND == "sqlite":
+        return SqliteStore(SQLITE_FILE, json_path=SAVE_FILE)
+    if STORAGE_BACKEND == "binary":
+        return BinaryStore(BINARY_FILE)
+    return JournalStore(SAVE_FILE)
+
+class NoteBlobs:
+    """Out-of-line storage for large note bodies, one file per note.
+
+    Before a snapshot reaches the store, bodies over LARGE_NOTE_CHARS are
+    written to BLOB_DIR and replaced by a "blob" reference, so the snapshot,
+    journal and database only carry small records. A body that has not been
+    loaded yet (content None) keeps pointing at its existing file.
+    """
+
+    def __init__(self, directory):
+        self.directory = directory
+        self._lock = threading.Lock()
+        self._written = {}
+        try:
+            self._on_disk = set(os.listdir(directory))
+        except OSError:
+            self._on_disk = set()
+
+    @staticmethod
+    def name_for(note_id):
+        return note_id + ".txt"
+
+    def read(self, name):
+        with open(os.path.join(self.directory, name), 'r') as f:
+            content = f.read()
+        with self._lock:
+            self._written[name] = content
+        return content
+
+    def externalise(self, notes):
+        """Write changed large bodies out and return the notes referencing them."""
+        result = []
+        keep = set()
+        for note in notes:
+            content = note.get("content")
+            if content is None:
+                name = note.get("blob") or self.name_for(note["id"])
+                keep.add(name)
+                note = dict(note, content="", blob=name)
+            elif len(content) > LARGE_NOTE_CHARS:
+                name = self.name_for(note["id"])
+                keep.add(name)
+                with self._lock:
+                    unchanged = self._written.get(name) == content
+                if not unchanged:
+                    os.makedirs(self.directory, exist_ok=True)
+                    _atomic_write(os.path.join(self.directory, name), content)
+                    self._on_disk.add(name)
+                    with self._lock:
+                        self._written[name] = content
+                note = dict(note, content="", blob=name)
+            elif "blob" in note:
+                note = {k: v for k, v in note.items() if k != "blob"}
+            result.append(note)
+        return tuple(result), keep
+
+    def prune(self, keep):
+        # Runs after the store no longer references the removed files
+        for name in self._on_disk - keep:
+            try:
+                os.remove(os.path.join(self.directory, name))
+            except OSError:
+                pass
+            with self._lock:
+                self._written.pop(name, None)
+        self._on_disk &= keep
+
+class NoteHistory:
+    """Revisions of note bodies as keyframes and splices, kept within a budget.
+
+    On disk it is an append-only log, rewritten once it grows well past it.
+    """
+
+    REVISION_OVERHEAD = 32
+    MAX_REVISION_SHARE = 8
+    VERSION = 2
+
+    def __init__(self, budget=HISTORY_BUDGET):
+        self.budget = budget
+        self.max_revision = budget // self.MAX_REVISION_SHARE
+        self._revisions = {}
+        self._latest = {}
+        self._since_keyframe = {}
+        self._order = []
+        self._order_start = 0
+        self.size = 0
+        # Log lines not yet handed to the save worker, and the cost of
+        # everything in the log file so far
+        self._log = []
+        self._logged = 0
+        self._rewrite = False
+
+    @classmethod
+    def _cost(cls, revision):
+        _, kind, payload = revision
+        return cls.REVISION_OVERHEAD + (len(payload) if kind == "k" else len(payload[2]))
+
+    @property
+    def changed(self):
+        return bool(self._log) or self._rewrite
+
+    def has(self, note_id):
+        return note_id in self._revisions
+
+    def record(self, note_id, text, timestamp=None):
+        if text is None or self._latest.get(note_id) == text:
+            return
+        timestamp = time.time() if timestamp is None else timestamp
+        previous = self._latest.get(note_id)
+        revision = None
+        if previous is not None and self._since_keyframe.get(note_id, 0) < HISTORY_KEYFRAME_INTERVAL - 1:
+            splice = text_splice(previous, text)
+            if len(splice[2]) < len(text) // 2:
+                revision = (timestamp, "d", splice)
+        if revision is None:
+            revision = (timestamp, "k", text)
+        if self._cost(revision) > self.max_revision:
+            # Too big to keep; later revisions still chain onto the last
+            # kept one
+            return
+        self._append(note_id, revision)
+        self._latest[note_id] = text
+        self._log.append({"id": note_id, "rev": revision})
+        self._logged += self._cost(revision)
+
+    def _append(self, note_id, revision):
+        self._revisions.setdefault(note_id, []).append(revision)
+        if revision[1] == "k":
+            self._since_keyframe[note_id] = 0
+        else:
+            self._since_keyframe[note_id] = self._since_keyframe.get(note_id, 0) + 1
+        self._order.append(note_id)
+        self.size += self._cost(revision)
+        self._evict()
+
+    def _evict(self):
+        # _order lists note ids in recording order, so its head is always
+        # the first revision of that note. The newest revision stays.
+        while self.size > self.budget and self._order_start < len(self._order) - 1:
+            note_id = self._order[self._order_start]
+            self._order_start += 1
+            revisions = self._revisions.get(note_id)
+            if not revisions:
+                continue
+            oldest = revisions.pop(0)
+            self.size -= self._cost(oldest)
+            if revisions and revisions[0][1] == "d":
+                # The next revision becomes the chain's starting keyframe
+                # (the head of a chain is always a keyframe)
+                ts, _, splice = revisions[0]
+                keyframe = (ts, "k", apply_text_splice(oldest[2], splice))
+                self.size += self._cost(keyframe) - self._cost(revisions[0])
+                revisions[0] = keyframe
+            if not revisions:
+                self._drop(note_id)
+        if self._order_start > 1024 and self._order_start * 2 > len(self._order):
+            del self._order[:self._order_start]
+            self._order_start = 0
+
+    def _drop(self, note_id):
+        self._revisions.pop(note_id, None)
+        self._latest.pop(note_id, None)
+        self._since_keyframe.pop(note_id, None)
+
+    def remove(self, note_id):
+        if note_id not in self._revisions:
+            return
+        for revision in self._revisions[note_id]:
+            self.size -= self._cost(revision)
+        self._drop(note_id)
+        self._log.append({"id": note_id, "del": True})
+
+    def revisions(self, note_id):
+        """Timestamps of the kept revisions of a note, oldest first."""
+        return [revision[0] for revision in self._revisions.get(note_id, ())]
+
+    def text_at(self, note_id, index):
+        revisions = self._revisions[note_id]
+        start = index
+        while revisions[start][1] != "k":
+            start -= 1
+        text = revisions[start][2]
+        for revision in revisions[start + 1:index + 1]:
+            text = apply_text_splice(text, revision[2])
+        return text
+
+    def request_rewrite(self):
+        """Have the next take_changes() rewrite the whole log."""
+        self._rewrite = True
+
+    def take_changes(self):
+        """Hand over what the log file is missing, for the save worker.
+
+        Returns (state, lines): state is None or a copy of every kept
+        revision, to replace the file with; lines are appended after it.
+        """
+        state = None
+        if self._rewrite or self._logged > 2 * self.budget:
+            state = {note_id: list(revisions) for note_id, revisions in self._revisions.items()}
+            self._log = []
+            self._logged = self.size
+            self._rewrite = False
+        lines, self._log = self._log, []
+        return state, lines
+
+    @staticmethod
+    def merge_changes(older, newer):
+        """Combine two take_changes() results that were not written yet."""
+        if older is None or newer[0] is not None:
+            return newer
+        return older[0], older[1] + newer[1]
+
+    @classmethod
+    def write_changes(cls, path, changes):
+        state, lines = changes
+        if state is not None:
+            entries = sorted(
+                ((revision[0], note_id, revision) for note_id, revisions in state.items() for revision in revisions),
+                key=lambda entry: entry[0])
+            text = json.dumps({"version": cls.VERSION}) + "\n"
+            text += "".join(json.dumps({"id": note_id, "rev": revision}) + "\n" for _, note_id, revision in entries)
+            _atomic_write(path, text)
+        if lines:
+            text = "".join(json.dumps(line) + "\n" for line in lines)
+            if not os.path.exists(path):
+                text = json.dumps({"version": cls.VERSION}) + "\n" + text
+            with open(path, 'a') as f:
+                f.write(text)
+
+    def load(self, path):
+        if not os.path.exists(path):
+            return
+        try:
+            with open(path, 'r') as f:
+                header = json.loads(f.readline() or "{}")
+                if header.get("version") != self.VERSION:
+                    raise ValueError(f"unknown history format version {header.get('version')!r}")
+                for line in f:
+                    try:
+                        entry = json.loads(line)
+                    except ValueError:
+                        # Torn by a crash mid-append; don't append after it
+                        self._rewrite = True
+                        break
+                    if entry.get("del"):
+                        self.remove(entry["id"])
+                    else:
+                        self._append(entry["id"], tuple(entry["rev"]))
+        except (ValueError, KeyError, IndexError, TypeError) as e:
+            logger.error("Error loading note history: %s", e)
+            self._rewrite = True
+        self._log = []
+        self._logged = os.path.getsize(path)
+        for note_id, revisions in self._revisions.items():
+            self._latest[note_id] = self.text_at(note_id, len(revisions) - 1)
+
+class SaveWorker(QThread):
+    """Writes note snapshots, newest first, and reads other processes' changes.
+
+    Both happen off the GUI thread and under LOCK_FILE.
+    """
+
+    external_change = pyqtSignal()
+    external_notes = pyqtSignal(object)
+
+    def __init__(self, store, blobs, history_path=None, parent=None):
+        super().__init__(parent)
+        self.store = store
+        self.blobs = blobs
+        self.history_path = history_path
+        self.lock_path = LOCK_FILE
+        # Only touched with the file lock held
+        self.signature = None
+        # Sequence number of the last snapshot that reached the disk
+        self.written_seq = 0
+        self._cond = threading.Condition()
+        self._pending = None
+        self._refresh = False
+        # (signature, seq): the files as merged by the GUI, valid for
+        # snapshots taken after seq
+        self._accepted = None
+        self._busy = False
+        self._stopping = False
+        self.writes = 0
+        self.coalesced = 0
+
+    def submit(self, snapshot):
+        with self._cond:
+            if self._pending is not None:
+                self.coalesced += 1
+                # Keep the history changes the newer snapshot would otherwise drop
+                theme, notes, history, seq = snapshot
+                history = NoteHistory.merge_changes(self._pending[2], history) if history else self._pending[2]
+                snapshot = (theme, notes, history, seq)
+            self._pending = snapshot
+            self._cond.notify_all()
+
+    def request_refresh(self):
+        with self._cond:
+            self._refresh = True
+            self._cond.notify_all()
+
+    def accept_signature(self, signature, seq):
+        with self._cond:
+            self._accepted = (signature, seq)
+
+    def set_signature(self, signature):
+        # With the file lock held
+        with self._cond:
+            self.signature = signature
+            self._accepted = None
+
+    def flush(self):
+        # Block until every submitted snapshot has reached the disk
+        with self._cond:
+            while self._pending is not None or self._refresh or self._busy:
+                self._cond.wait()
+
+    def stop(self):
+        self.flush()
+        with self._cond:
+            self._stopping = True
+            self._cond.notify_all()
+        self.wait()
+
+    def run(self):
+        while True:
+            with self._cond:
+                while self._pending is None and not self._refresh and not self._stopping:
+                    self._cond.wait()
+                if self._refresh:
+                    # First, as a pending snapshot would only be dropped
+                    # as conflicting
+                    snapshot = None
+                    self._refresh = False
+                elif self._pending is not None:
+                    snapshot = self._pending
+                    self._pending = None
+                else:
+                    return
+                self._busy = True
+            try:
+                if snapshot is None:
+                    changes = self.read_external_changes()
+                    if changes is not None:
+                        self.external_notes.emit(changes)
+                else:
+                    with metrics.span("write_snapshot"):
+                        self.write_snapshot(snapshot)
+                    self.writes += 1
+                    metrics.count("saves")
+            except Exception as e:
+                logger.exception("Error %s notes: %s", "reading" if snapshot is None else "saving", e)
+            finally:
+                with self._cond:
+                    self._busy = False
+                    self._cond.notify_all()
+
+    def _accept(self, seq):
+        # With the file lock held
+        with self._cond:
+            if self._accepted is not None and seq > self._accepted[1]:
+                self.signature = self._accepted[0]
+                self._accepted = None
+
+    def read_external_changes(self):
+        """Return (theme, notes, signature) if someone else changed the files.
+
+        notes is None when the files turned out to be damaged.
+
+        Runs on the worker thread, or on the caller's once flush() returned.
+        """
+        with FileLock(self.lock_path):
+            signature = files_signature(self.store.paths())
+            with self._cond:
+                known = {self.signature, self._accepted and self._accepted[0]}
+            # Our own writes leave the signature recorded here
+            if signature in known:
+                return None
+            self.store.recovered = None
+            theme, notes = self.store.refresh()
+            if self.store.recovered:
+                # Not someone else's notes but a damaged file, now moved
+                # aside; this instance's notes are saved in its place
+                notes = None
+            return theme, notes, files_signature(self.store.paths())
+
+    def write_snapshot(self, snapshot):
+        theme, notes, history, seq = snapshot
+        with FileLock(self.lock_path):
+            self._accept(seq)
+            if self.signature is not None and files_signature(self.store.paths()) != self.signature:
+                logger.info("Save files changed on disk; merging before saving")
+                self.external_change.emit()
+                return
+            notes, blob_names = self.blobs.externalise(notes)
+            self.store.write(theme, notes)
+            self.blobs.prune(blob_names)
+            if history is not None and self.history_path:
+                NoteHistory.write_changes(self.history_path, history)
+            self.signature = files_signature(self.store.paths())
+            self.written_seq = seq
+
+# Stylesheet builders; callers go through theme_resources.stylesheet()
+
+def _showhide_stylesheet(theme, color_index=None):
+    font_color = '#fff' if theme == 'dark' else '#000'
+    bg_color = '#222' if theme == 'dark' else '#fff'
+    btn_bg = '#333' if theme == 'dark' else '#eee'
+    btn_fg = '#fff' if theme == 'dark' else '#000'
+    return f"""
+        QDialog {{ 
+            background: {bg_color}; 
+            color: {font_color}; 
+        }}
+        QCheckBox, QListView {{ 
+            color: {font_color}; 
+            background: transparent; 
+        }}
+        QListView {{ 
+            border: 1px solid #888; 
+        }}
+        QLineEdit, QComboBox {{ 
+            color: {font_color}; 
+            background: {bg_color}; 
+            border: 1px solid #888; 
+            padding: 2px; 
+        }}
+        QDialogButtonBox QPushButton, QPushButton {{ 
+            color: {btn_fg}; 
+            background: {btn_bg}; 
+            border-radius: 6px; 
+            border: 1px solid #888; 
+        }}
+    """
+
+def _readme_stylesheet(theme, color_index=None):
+    font_color = '#fff' if theme == 'dark' else '#000'
+    bg_color = '#222' if theme == 'dark' else '#fff'
+    btn_bg = '#333' if theme == 'dark' else '#eee'
+    btn_fg = '#fff' if theme == 'dark' else '#000'
+    return f"""
+        QDialog {{ 
+            background: {bg_color}; 
+            color: {font_color}; 
+        }}
+        QTextBrowser {{ 
+            background: {bg_color}; 
+            color: {font_color}; 
+            border: none;
+        }}
+        QScrollArea {{ 
+            background: {bg_color}; 
+            border: none;
+        }}
+        QDialogButtonBox QPushButton {{ 
+            color: {btn_fg}; 
+            background: {btn_bg}; 
+            border-radius: 6px; 
+            border: 1px solid #888; 
+            padding: 5px 15px;
+        }}
+    """
+
+def _note_rules(theme, color_index):
+    palette = get_pastel_palette(theme)
+    bg_rgb = palette[color_index]
+    font_color = get_contrast_font_color(bg_rgb)
+    border_col = '#888' if theme == 'light' else '#444'
+    btn_bg = '#eee' if theme == 'light' else '#222'
+    btn_fg = '#000' if theme == 'light' else '#fff'
+    note = f'QWidget#noteBody[theme="{theme}"][colorIndex="{color_index}"]'
+    return f"""
+    {note}, {note} QWidget {{
+        background-color: rgb{bg_rgb};
+        border: none;
+        border-radius: 14px;
+    }}
+    {note} QLabel {{
+        color: {font_color};
+        background: transparent;
+    }}
+    {note} QLineEdit {{
+        color: {font_color};
+        background: transparent;
+        border: none;
+        font-weight: bold;
+    }}
+    {note} QTextEdit, {note} QPlainTextEdit {{
+        background-color: rgb{bg_rgb};
+        color: {font_color};
+        border: none;
+        border-radius: 0px;
+    }}
+    {note} QToolButton#font_minus_btn, {note} QToolButton#font_plus_btn {{
+        border: 1.5px solid {border_col};
+        border-radius: 6px;
+        background: {btn_bg};
+        color: {btn_fg};
+        min-width: 22px;
+        min-height: 22px;
+    }}
+    {note} QSpinBox {{
+        border: none;
+        background: transparent;
+    }}
+    """
+
+def _application_stylesheet(theme=None, color_index=None):
+    # Every note style for both themes, selected through the dynamic
+    # "theme" and "colorIndex" properties on each note's body widget. It is
+    # installed once, so recolouring a note never re-parses CSS.
+    rules = ["QToolTip { border: 1px solid #888; }"]
+    for note_theme in ('light', 'dark'):
+        for index in range(len(get_pastel_palette(note_theme))):
+            rules.append(_note_rules(note_theme, index))
+    return "\n".join(rules)
+
+def _menu_stylesheet(theme, color_index=None):
+    font_color = '#fff' if theme == 'dark' else '#000'
+    bg_color = '#222' if theme == 'dark' else '#fff'
+    btn_bg = '#333' if theme == 'dark' else '#eee'
+    btn_fg = '#fff' if theme == 'dark' else '#000'
+    return f"""
+        QMenu {{
+            background: {bg_color};
+            color: {font_color};
+            border: 1px solid #888;
+        }}
+        QMenu::item {{
+            padding: 5px 20px;
+        }}
+        QMenu::item:selected {{
+            background: {btn_bg};
+            color: {btn_fg};
+        }}
+    """
+
+def _new_note_stylesheet(theme, color_index=None):
+    font_color = '#fff' if theme == 'dark' else '#000'
+    bg_color = '#222' if theme == 'dark' else '#fff'
+    btn_bg = '#333' if theme == 'dark' else '#eee'
+    btn_fg = '#fff' if theme == 'dark' else '#000'
+    return f"""
+        QDialog {{ background: {bg_color}; color: {font_color}; }}
+        QLabel {{ color: {font_color}; }}
+        QLineEdit {{ color: {font_color}; background: transparent; border: 1px solid #888; }}
+        QDialogButtonBox QPushButton {{ color: {btn_fg}; background: {btn_bg}; border-radius: 6px; border: 1px solid #888; }}
+    """
+
+def _message_box_stylesheet(theme, color_index=None):
+    font_color = '#fff' if theme == 'dark' else '#000'
+    bg_color = '#222' if theme == 'dark' else '#fff'
+    btn_bg = '#333' if theme == 'dark' else '#eee'
+    btn_fg = '#fff' if theme == 'dark' else '#000'
+    btn_hover = '#444' if theme == 'dark' else '#ddd'
+    return f"""
+        QMessageBox {{
+            background: {bg_color};
+            color: {font_color};
+        }}
+        QMessageBox QLabel {{
+            color: {font_color};
+        }}
+        QPushButton {{
+            color: {btn_fg};
+            background: {btn_bg};
+            border-radius: 6px;
+            border: 1px solid #888;
+            padding: 5px 15px;
+        }}
+        QPushButton:hover {{
+            background: {btn_hover};
+        }}
+    """
+
+def _search_stylesheet(theme, color_index=None):
+    font_color = '#fff' if theme == 'dark' else '#000'
+    bg_color = '#222' if theme == 'dark' else '#fff'
+    btn_bg = '#333' if theme == 'dark' else '#eee'
+    btn_fg = '#fff' if theme == 'dark' else '#000'
+    return f"""
+    QDialog {{ background: {bg_color}; color: {font_color}; }}
+    QLineEdit {{ color: {font_color}; background: transparent; border: 1px solid #888; padding: 3px; }}
+    QListWidget {{ color: {font_color}; background: {bg_color}; border: 1px solid #888; }}
+    QListWidget::item:selected {{ background: {btn_bg}; color: {btn_fg}; }}
+    QPlainTextEdit {{ color: {font_color}; background: {bg_color}; border: 1px solid #888; }}
+    QPushButton {{ color: {btn_fg}; background: {btn_bg}; border-radius: 6px; border: 1px solid #888; padding: 5px 15px; }}
+    """
+
+def _swatch_stylesheet(theme, color_index=None):
+    rgb = get_pastel_palette(theme)[color_index]
+    return f"background-color: rgb{rgb}; border-radius: 16px; border: 2px solid #888;"
+
+STYLESHEET_BUILDERS = {
+    'showhide': _showhide_stylesheet,
+    'readme': _readme_stylesheet,
+    'menu': _menu_stylesheet,
+    'new_note': _new_note_stylesheet,
+    'message_box': _message_box_stylesheet,
+    'search': _search_stylesheet,
+    'swatch': _swatch_stylesheet,
+    'application': _application_stylesheet,
+}
+
+def repolish(widget):
+    # Dynamic properties only take effect once the style re-polishes the
+    # widget, and descendant selectors need its children re-polished too
+    style = widget.style()
+    for w in [widget] + widget.findChildren(QWidget):
+        style.unpolish(w)
+        style.polish(w)
+    widget.update()
+
+class ThemeResources:
+    """Cache of pre-rendered icons and pre-built stylesheets.
+
+    Entries are keyed by (resource, theme, colour, device pixel ratio). The
+    cache only holds the current theme: set_theme() drops the old theme's
+    entries and warms the new theme once, so toggling the theme swaps cached QIcons
+    instead of repainting them for every note.
+    """
+
+    ICON_NAMES = ('settings', 'minimize', 'palette', 'delete', 'tray')
+    PER_COLOUR = ('swatch',)
+    THEMELESS = ('application',)
+
+    def __init__(self):
+        self.theme = None
+        self._cache = {}
+        self.renders = 0
+
+    @staticmethod
+    def _dpr():
+        app = QApplication.instance()
+        return app.devicePixelRatio() if app else 1.0
+
+    def icon(self, name, theme):
+        dpr = self._dpr()
+        key = ('icon:' + name, theme, None, dpr)
+        icon = self._cache.get(key)
+        if icon is None:
+            if name == 'tray':
+                icon = QIcon(create_sticky_note_icon(theme, dpr))
+            else:
+                icon = QIcon(get_icon_pixmap(name, theme, dpr))
+            self.renders += 1
+            self._cache[key] = icon
+        return icon
+
+    def stylesheet(self, name, theme=None, color_index=None):
+        if name in self.THEMELESS:
+            theme = None
+        key = ('css:' + name, theme, color_index, None)
+        css = self._cache.get(key)
+        if css is None:
+            css = STYLESHEET_BUILDERS[name](theme, color_index)
+            self._cache[key] = css
+        return css
+
+    def set_theme(self, theme):
+        if theme == self.theme:
+            return
+        self._cache = {key: value for key, value in self._cache.items() if key[1] is None}
+        self.theme = theme
+        self.warm(theme)
+
+    def warm(self, theme):
+        for name in self.ICON_NAMES:
+            self.icon(name, theme)
+        for name in STYLESHEET_BUILDERS:
+            if name in self.THEMELESS:
+                continue
+            if name in self.PER_COLOUR:
+                for color_index in range(len(get_pastel_palette(theme))):
+                    self.stylesheet(name, theme, color_index)
+            else:
+                self.stylesheet(name, theme)
+
+theme_resources = ThemeResources()
+
+class NoteRecord:
+    """Plain data for one note, independent of any Qt widget.
+
+    Records are what the app keeps, saves, searches and lists in dialogs.
+    A NoteWidget is only attached while the note has a window; it writes
+    its edits back into the record as they happen.
+    """
+
+    __slots__ = ("id", "title", "content", "font_size", "is_visible",
+                 "color_index", "size", "pos", "blob", "widget")
+
+    def __init__(self, note_id=None, title="", content="", font_size=DEFAULT_FONT_SIZE,
+                 is_visible=True, color_index=0, size=None, pos=None):
+        self.id = note_id or new_note_id()
+        self.title = title
+        self.content = content
+        self.font_size = font_size
+        self.is_visible = is_visible
+        self.color_index = color_index
+        self.size = size
+        self.pos = pos
+        # File holding a large body; content stays None until it is loaded
+        self.blob = None
+        self.widget = None
+
+    @classmethod
+    def from_data(cls, data):
+        record = cls(
+            note_id=data.get("id"),
+            title=data.get("title", ""),
+            content=data.get("content", ""),
+            font_size=data.get("font_size", DEFAULT_FONT_SIZE),
+            is_visible=data.get("is_visible", True),
+            color_index=data.get("color_index", 0),
+            size=data.get("size"),
+            pos=data.get("pos"),
+        )
+        if data.get("blob"):
+            record.blob = data["blob"]
+            record.content = None
+        return record
+
+    def is_large(self):
+        return self.content is None or len(self.content) > LARGE_NOTE_CHARS
+
+    def to_data(self):
+        data = {
+            "id": self.id,
+            "title": self.title,
+            "content": self.content,
+            "font_size": self.font_size,
+            "is_visible": self.is_visible,
+            "color_index": self.color_index,
+        }
+        if self.size:
+            data["size"] = list(self.size)
+        if self.pos:
+            data["pos"] = list(self.pos)
+        if self.blob:
+            data["blob"] = self.blob
+        return data
+
+class SpatialGrid:
+    """Uniform grid of buckets over note rectangles.
+
+    Each rectangle is registered in every SPATIAL_CELL_SIZE bucket it
+    touches, so an overlap query only looks at the notes near the queried
+    area instead of at every note.
+    """
+
+    def __init__(self, cell_size=SPATIAL_CELL_SIZE):
+        self.cell_size = cell_size
+        self._cells = {}
+        self._rects = {}
+
+    def _cells_for(self, rect):
+        x, y, w, h = rect
+        size = self.cell_size
+        for cx in range(x // size, (x + max(w, 1) - 1) // size + 1):
+            for cy in range(y // size, (y + max(h, 1) - 1) // size + 1):
+                yield cx, cy
+
+    def update(self, key, rect):
+        self.remove(key)
+        self._rects[key] = rect
+        for cell in self._cells_for(rect):
+            self._cells.setdefault(cell, set()).add(key)
+
+    def remove(self, key):
+        rect = self._rects.pop(key, None)
+        if rect is None:
+            return
+        for cell in self._cells_for(rect):
+            keys = self._cells.get(cell)
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del self._cells[cell]
+
+    def clear(self):
+        self._cells.clear()
+        self._rects.clear()
+
+    def query(self, rect):
+        """Return the rectangles overlapping rect as {key: rect}."""
+        x, y, w, h = rect
+        hits = {}
+        for cell in self._cells_for(rect):
+            for key in self._cells.get(cell, ()):
+                if key in hits:
+                    continue
+                ox, oy, ow, oh = self._rects[key]
+                if ox < x + w and x < ox + ow and oy < y + h and y < oy + oh:
+                    hits[key] = self._rects[key]
+        return hits
+
+def snap_position(x, y, width, height, rects, distance):
+    """Move (x, y) onto the closest edge of rects within distance, per axis.
+
+    rects are (x, y, w, h) tuples of other notes and screen areas; a note
+    may line up with an edge or sit against it from either side.
+    """
+    best_x = best_y = None
+    for ox, oy, ow, oh in rects:
+        for candidate in (ox, ox + ow, ox - width, ox + ow - width):
+            delta = candidate - x
+            if abs(delta) <= distance and (best_x is None or abs(delta) < abs(best_x)):
+                best_x = delta
+        for candidate in (oy, oy + oh, oy - height, oy + oh - height):
+            delta = candidate - y
+            if abs(delta) <= distance and (best_y is None or abs(delta) < abs(best_y)):
+                best_y = delta
+    return x + (best_x or 0), y + (best_y or 0)
+
+def screens_by_cursor():
+    """Available screen areas, the one under the mouse cursor first."""
+    current = QApplication.screenAt(QCursor.pos()) or QApplication.primaryScreen()
+    screens = [current] + [screen for screen in QApplication.screens() if screen is not current]
+    return [screen.availableGeometry() for screen in screens]
+
+class NoteSearchIndex:
+    """In-memory inverted index over note titles and bodies.
+
+    Tokens map to the ids of the notes containing them. The vocabulary is
+    also kept sorted, so a prefix query is a bisect plus a scan over the
+    matching tokens. Updating a note only re-tokenises that note.
+    """
+
+    TOKEN_RE = re.compile(r"\w+")
+    # Fewer new or dropped tokens than this are bisected into the sorted
+    # vocabulary one by one; more are merged in with a single pass
+    VOCABULARY_MERGE_MIN = 64
+    # Greedy, so it finds the last non-word character without the
+    # backtracking a search for r"\w+$" does over a long word
+    LAST_BREAK_RE = re.compile(r".*\W", re.S)
+    FILE_CHUNK_CHARS = 65536
+
+    def __init__(self):
+        self._postings = {}
+        self._note_tokens = {}
+        self._vocabulary = []
+
+    @classmethod
+    def tokenize(cls, text):
+        return {token.lower() for token in cls.TOKEN_RE.findall(text)}
+
+    @classmethod
+    def tokenize_chunks(cls, chunks):
+        """Yield the tokens of text that arrives in chunks, a set per chunk."""
+        carry = ""
+        for chunk in chunks:
+            text = carry + chunk
+            # A word cut off at the end of the chunk goes on in the next
+            match = cls.LAST_BREAK_RE.match(text)
+            cut = match.end() if match else 0
+            carry = text[cut:]
+            yield cls.tokenize(text[:cut])
+        yield cls.tokenize(carry)
+
+    @classmethod
+    def tokenize_file(cls, path):
+        """tokenize() for a text file, read a chunk at a time."""
+        tokens = set()
+        with open(path, 'r') as f:
+            for chunk_tokens in cls.tokenize_chunks(iter(lambda: f.read(cls.FILE_CHUNK_CHARS), "")):
+                tokens |= chunk_tokens
+        return tokens
+
+    def update(self, note_id, text, extra_tokens=()):
+        tokens = self.tokenize(text)
+        tokens.update(extra_tokens)
+        old = self._note_tokens.get(note_id, frozenset())
+        dropped = [token for token in old - tokens if self._drop(token, note_id)]
+        added = []
+        for token in tokens - old:
+            ids = self._postings.get(token)
+            if ids is None:
+                ids = self._postings[token] = set()
+                added.append(token)
+            ids.add(note_id)
+        self._note_tokens[note_id] = frozenset(tokens)
+        self._update_vocabulary(added, dropped)
+
+    def add(self, note_id, tokens):
+        """Add tokens to a note, keeping the ones it has; for bodies indexed in pieces."""
+        old = self._note_tokens.get(note_id, frozenset())
+        added = []
+        for token in tokens - old:
+            ids = self._postings.get(token)
+            if ids is None:
+                ids = self._postings[token] = set()
+                added.append(token)
+            ids.add(note_id)
+        self._note_tokens[note_id] = old | tokens
+        self._update_vocabulary(added, ())
+
+    def remove(self, note_id):
+        dropped = [token for token in self._note_tokens.pop(note_id, ()) if self._drop(token, note_id)]
+        self._update_vocabulary((), dropped)
+
+    def _drop(self, token, note_id):
+        """Remove note_id from a token; return True if no note has it left."""
+        ids = self._postings[token]
+        ids.discard(note_id)
+        if not ids:
+            del self._postings[token]
+            return True
+        return False
+
+    def _update_vocabulary(self, added, dropped):
+        vocabulary = self._vocabulary
+        if len(dropped) < self.VOCABULARY_MERGE_MIN:
+            for token in dropped:
+                del vocabulary[bisect.bisect_left(vocabulary, token)]
+        else:
+            dropped = set(dropped)
+            vocabulary[:] = [token for token in vocabulary if token not in dropped]
+        if len(added) < self.VOCABULARY_MERGE_MIN:
+            for token in added:
+                bisect.insort(vocabulary, token)
+        else:
+            # Two sorted runs, which sort() merges in linear time
+            vocabulary += sorted(added)
+            vocabulary.sort()
+
+    def clear(self):
+        self._postings.clear()
+        self._note_tokens.clear()
+        self._vocabulary.clear()
+
+    def _prefix_matches(self, prefix):
+        ids = set()
+        start = bisect.bisect_left(self._vocabulary, prefix)
+        for token in self._vocabulary[start:]:
+            if not token.startswith(prefix):
+                break
+            ids |= self._postings[token]
+        return ids
+
+    def search(self, query):
+        """Return ids of notes matching every word of query as a prefix."""
+        terms = sorted(self.tokenize(query), key=len, reverse=True)
+        if not terms:
+            return set()
+        result = self._prefix_matches(terms[0])
+        for term in terms[1:]:
+            if not result:
+                break
+            result &= self._prefix_matches(term)
+        return result
+
+class SearchDialog(QDialog):
+    def __init__(self, app, parent=None):
+        super().__init__(parent)
+        self.setWindowTitle("Search Notes")
+        self.app = app
+        self.matches = []
+        layout = QVBoxLayout(self)
+        self.query_edit = QLineEdit()
+        self.query_edit.setPlaceholderText("Search titles and text...")
+        self.query_edit.textChanged.connect(self.update_results)
+        layout.addWidget(self.query_edit)
+        self.results = QListWidget()
+        self.results.itemActivated.connect(self.show_item)
+        layout.addWidget(self.results)
+        btn_layout = QHBoxLayout()
+        show_matches_btn = QPushButton("Show Matches")
+        show_matches_btn.clicked.connect(self.show_matches)
+        btn_layout.addWidget(show_matches_btn)
+        close_btn = QPushButton("Close")
+        close_btn.clicked.connect(self.accept)
+        btn_layout.addWidget(close_btn)
+        layout.addLayout(btn_layout)
+        self.apply_theme(app.theme)
+        self.resize(420, 360)
 
-def get_pastel_palette(theme):
-    return LIGHT_PASTELS if theme == 'light' else DARK_PASTELS
+    def apply_theme(self, theme):
+        self.setStyleSheet(theme_resources.stylesheet('search', theme))
 
-def get_contrast_font_color(bg_rgb):
-    # Use black for light backgrounds, white for dark
-    r, g, b = bg_rgb
-    luminance = (0.299*r + 0.587*g + 0.114*b)
-    return '#000' if luminance > 150 else '#fff'
+    def update_results(self, text):
+        self.matches = self.app.search_notes(text)
+        self.results.clear()
+        for record in self.matches[:MAX_SEARCH_RESULTS]:
+            item = QListWidgetItem(record.title)
+            item.setData(Qt.UserRole, record.id)
+            self.results.addItem(item)
 
-def create_sticky_note_icon(theme='light'):
-    # Create a sticky note icon
-    pix = QPixmap(ICON_SIZE, ICON_SIZE)
-    pix.fill(Qt.transparent)
-    p = QPainter(pix)
-    
-    # Set up colors based on theme
-    if theme == 'light':
-        note_color = QColor(255, 255, 150)  # Light yellow
-        border_color = QColor(200, 200, 100)
-        line_color = QColor(180, 180, 80)
-    else:
-        note_color = QColor(80, 80, 40)  # Dark yellow
-        border_color = QColor(100, 100, 50)
-        line_color = QColor(120, 120, 60)
-    
-    # Draw the main note shape
-    p.setPen(border_color)
-    p.setBrush(note_color)
-    p.drawRect(2, 2, 16, 16)
-    
-    # Draw lines to make it look like paper
-    p.setPen(line_color)
-    p.drawLine(4, 8, 16, 8)
-    p.drawLine(4, 12, 16, 12)
-    p.drawLine(4, 16, 16, 16)
-    
-    p.end()
-    return pix
+    def show_item(self, item):
+        record = self.app.records.get(item.data(Qt.UserRole))
+        if record:
+            self.app.set_note_visible(record, True)
+            record.widget.raise_()
+
+    def show_matches(self):
+        # Only the matching notes are touched; everything else stays as it is
+        for record in self.matches:
+            if record.id in self.app.records:
+                self.app.set_note_visible(record, True)
+
+class NotesListModel(QAbstractListModel):
+    """List model over the app's note records, one row per note.
+
+    The app keeps a single instance alive and reports renames, visibility
+    and colour changes, additions and deletions as row updates, so views
+    never have to be rebuilt.
+    """
+
+    TitleSortRole = Qt.UserRole + 1
+    ColorRole = Qt.UserRole + 2
+
+    def __init__(self, app):
+        super().__init__(app)
+        self.app = app
+        self._ids = []
+        self._rows = {}
+        self._batching = False
+
+    def reset(self):
+        self.beginResetModel()
+        self._ids = list(self.app.records)
+        self._rows = {note_id: row for row, note_id in enumerate(self._ids)}
+        self.endResetModel()
+
+    def rowCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self._ids)
+
+    def record_at(self, row):
+        return self.app.records.get(self._ids[row])
+
+    def data(self, index, role=Qt.DisplayRole):
+        if not index.isValid():
+            return None
+        record = self.record_at(index.row())
+        if record is None:
+            return None
+        if role == Qt.DisplayRole:
+            return record.title
+        if role == Qt.CheckStateRole:
+            return Qt.Checked if record.is_visible else Qt.Unchecked
+        if role == Qt.DecorationRole:
+            palette = get_pastel_palette(self.app.theme)
+            return QColor(*palette[record.color_index % len(palette)])
+        if role == self.TitleSortRole:
+            return record.title.lower()
+        if role == self.ColorRole:
+            return record.color_index
+        if role == Qt.UserRole:
+            return record.id
+        return None
+
+    def flags(self, index):
+        if not index.isValid():
+            return Qt.NoItemFlags
+        return Qt.ItemIsEnabled | Qt.ItemIsSelectable | Qt.ItemIsUserCheckable
+
+    def setData(self, index, value, role=Qt.EditRole):
+        if role != Qt.CheckStateRole or not index.isValid():
+            return False
+        record = self.record_at(index.row())
+        if record is None:
+            return False
+        self.app.set_note_visible(record, value == Qt.Checked)
+        return True
+
+    def note_added(self, record):
+        row = len(self._ids)
+        self.beginInsertRows(QModelIndex(), row, row)
+        self._ids.append(record.id)
+        self._rows[record.id] = row
+        self.endInsertRows()
+
+    def note_removed(self, note_id):
+        row = self._rows.get(note_id)
+        if row is None:
+            return
+        self.beginRemoveRows(QModelIndex(), row, row)
+        del self._ids[row]
+        self._rows = {note_id: row for row, note_id in enumerate(self._ids)}
+        self.endRemoveRows()
+
+    def note_updated(self, record):
+        if self._batching:
+            return
+        row = self._rows.get(record.id)
+        if row is not None:
+            index = self.index(row)
+            self.dataChanged.emit(index, index)
+
+    def begin_batch(self):
+        self._batching = True
+
+    def end_batch(self):
+        self._batching = False
+        self.refresh_all()
+
+    def refresh_all(self):
+        # One change notification covering every row
+        if self._ids:
+            self.dataChanged.emit(self.index(0), self.index(len(self._ids) - 1))
+
+class HistoryDialog(QDialog):
+    def __init__(self, app, record, parent=None):
+        super().__init__(parent)
+        self.setWindowTitle(f"History: {record.title}")
+        self.app = app
+        self.record = record
+        layout = QHBoxLayout(self)
+        self.revision_list = QListWidget()
+        self.revision_list.setMaximumWidth(180)
+        self.revision_list.currentRowChanged.connect(self.show_revision)
+        layout.addWidget(self.revision_list)
+        right = QVBoxLayout()
+        self.preview = QPlainTextEdit()
+        self.preview.setReadOnly(True)
+        right.addWidget(self.preview)
+        btn_layout = QHBoxLayout()
+        restore_btn = QPushButton("Restore")
+        restore_btn.clicked.connect(self.restore)
+        btn_layout.addWidget(restore_btn)
+        close_btn = QPushButton("Close")
+        close_btn.clicked.connect(self.reject)
+        btn_layout.addWidget(close_btn)
+        right.addLayout(btn_layout)
+        layout.addLayout(right)
+        # Newest first
+        self.timestamps = app.history.revisions(record.id)
+        for ts in reversed(self.timestamps):
+            self.revision_list.addItem(time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(ts)))
+        self.setStyleSheet(theme_resources.stylesheet('search', app.theme))
+        self.resize(640, 420)
+        if self.timestamps:
+            self.revision_list.setCurrentRow(0)
+
+    def selected_index(self):
+        row = self.revision_list.currentRow()
+        return None if row < 0 else len(self.timestamps) - 1 - row
+
+    def show_revision(self, row):
+        index = self.selected_index()
+        if index is not None:
+            self.preview.setPlainText(self.app.history.text_at(self.record.id, index))
+
+    def restore(self):
+        index = self.selected_index()
+        if index is None:
+            return
+        self.app.set_note_visible(self.record, True)
+        # Goes through the normal edit path, so the restore is itself a revision
+        self.record.widget.text_edit.setPlainText(self.app.history.text_at(self.record.id, index))
+        self.accept()
 
 class ShowHideDialog(QDialog):
-    def __init__(self, notes, parent=None):
+    SORT_MODES = (("Note order", None), ("Title", NotesListModel.TitleSortRole), ("Colour", NotesListModel.ColorRole))
+
+    def __init__(self, model, parent=None):
         super().__init__(parent)
         self.setWindowTitle("Show/Hide Notes")
-        self.notes = notes
-        self.checkboxes = {}
+        self.app = parent
+        self.model = model
         layout = QVBoxLayout(self)
         
-        # Set theme-based text and background color
-        theme = parent.theme if parent and hasattr(parent, 'theme') else 'dark'
-        font_color = '#fff' if theme == 'dark' else '#000'
-        bg_color = '#222' if theme == 'dark' else '#fff'
-        btn_bg = '#333' if theme == 'dark' else '#eee'
-        btn_fg = '#fff' if theme == 'dark' else '#000'
+        # Filter and sort controls
+        controls = QHBoxLayout()
+        self.filter_edit = QLineEdit()
+        self.filter_edit.setPlaceholderText("Filter by title...")
+        controls.addWidget(self.filter_edit)
+        self.sort_combo = QComboBox()
+        for label, _ in self.SORT_MODES:
+            self.sort_combo.addItem(label)
+        self.sort_combo.currentIndexChanged.connect(self.apply_sort)
+        controls.addWidget(self.sort_combo)
+        layout.addLayout(controls)
         
-        # Set stylesheet for dialog and children
-        self.setStyleSheet(f"""
-            QDialog {{ 
-                background: {bg_color}; 
-                color: {font_color}; 
-            }}
-            QCheckBox {{ 
-                color: {font_color}; 
-                background: transparent; 
-            }}
-            QDialogButtonBox QPushButton, QPushButton {{ 
-                color: {btn_fg}; 
-                background: {btn_bg}; 
-                border-radius: 6px; 
-                border: 1px solid #888; 
-            }}
-        """)
+        # The proxy filters and sorts without touching the shared model
+        self.proxy = QSortFilterProxyModel(self)
+        self.proxy.setSourceModel(model)
+        self.proxy.setFilterCaseSensitivity(Qt.CaseInsensitive)
+        self.filter_edit.textChanged.connect(self.proxy.setFilterFixedString)
         
-        # Add checkboxes for each note
-        for note in notes:
-            cb = QCheckBox(note.title)
-            cb.setChecked(note.is_visible)
-            cb.stateChanged.connect(self.make_toggle_cb(note))
-            layout.addWidget(cb)
-            self.checkboxes[note] = cb
+        # Only the rows in view are laid out and painted
+        self.view = QListView()
+        self.view.setUniformItemSizes(True)
+        self.view.setModel(self.proxy)
+        layout.addWidget(self.view)
             
         # Add Show All and Hide All buttons
         btn_layout = QHBoxLayout()
@@ -231,9 +2687,15 @@ class ShowHideDialog(QDialog):
         btn_box.accepted.connect(self.accept)
         layout.addWidget(btn_box)
 
+        self.resize(360, 480)
+        self.apply_theme(parent.theme if parent and hasattr(parent, 'theme') else 'dark')
+
         # Center the dialog on screen
         self.center_on_screen()
 
+    def apply_theme(self, theme):
+        self.setStyleSheet(theme_resources.stylesheet('showhide', theme))
+
     def center_on_screen(self):
         # Get the screen geometry
         screen = QApplication.primaryScreen().geometry()
@@ -245,26 +2707,28 @@ class ShowHideDialog(QDialog):
         # Move the dialog to the center
         self.move(x, y)
 
-    def make_toggle_cb(self, note):
-        def toggle(state):
-            note.set_visible(bool(state))
-        return toggle
+    def apply_sort(self, mode):
+        role = self.SORT_MODES[mode][1]
+        if role is None:
+            self.proxy.sort(-1)
+        else:
+            self.proxy.setSortRole(role)
+            self.proxy.sort(0)
+
+    def filtered_records(self):
+        # "Show All" / "Hide All" apply to the rows left by the filter
+        records = []
+        for row in range(self.proxy.rowCount()):
+            note_id = self.proxy.index(row, 0).data(Qt.UserRole)
+            if note_id in self.app.records:
+                records.append(self.app.records[note_id])
+        return records
 
     def show_all_notes(self):
-        for note in self.notes:
-            note.set_visible(True)
-            if note in self.checkboxes:
-                self.checkboxes[note].setChecked(True)
+        self.app.set_notes_visible(self.filtered_records(), True)
 
     def hide_all_notes(self):
-        for note in self.notes:
-            note.set_visible(False)
-            if note in self.checkboxes:
-                self.checkboxes[note].setChecked(False)
-
-    def set_checkbox(self, note, checked):
-        if note in self.checkboxes:
-            self.checkboxes[note].setChecked(checked)
+        self.app.set_notes_visible(self.filtered_records(), False)
 
 class ReadmeDialog(QDialog):
     def __init__(self, theme, parent=None):
@@ -296,6 +2760,8 @@ A modern, feature-rich sticky notes application built with PyQt5.
 <li>Stay on top of other windows</li>
 <li>System tray integration</li>
 <li>Multiple workspace support</li>
+<li>Search across all note titles and text</li>
+<li>Per-note revision history, with restore</li>
 </ul>
 
 <h2>Keyboard Shortcuts</h2>
@@ -339,38 +2805,15 @@ This project is open source and available under the MIT License.
         layout.addWidget(btn_box)
         
         # Apply theme-based styling
-        font_color = '#fff' if theme == 'dark' else '#000'
-        bg_color = '#222' if theme == 'dark' else '#fff'
-        btn_bg = '#333' if theme == 'dark' else '#eee'
-        btn_fg = '#fff' if theme == 'dark' else '#000'
-        
-        self.setStyleSheet(f"""
-            QDialog {{ 
-                background: {bg_color}; 
-                color: {font_color}; 
-            }}
-            QTextBrowser {{ 
-                background: {bg_color}; 
-                color: {font_color}; 
-                border: none;
-            }}
-            QScrollArea {{ 
-                background: {bg_color}; 
-                border: none;
-            }}
-            QDialogButtonBox QPushButton {{ 
-                color: {btn_fg}; 
-                background: {btn_bg}; 
-                border-radius: 6px; 
-                border: 1px solid #888; 
-                padding: 5px 15px;
-            }}
-        """)
+        self.apply_theme(theme)
         
         # Set dialog size and center it
         self.resize(600, 500)
         self.center_on_screen()
 
+    def apply_theme(self, theme):
+        self.setStyleSheet(theme_resources.stylesheet('readme', theme))
+
     def center_on_screen(self):
         # Get the screen geometry
         screen = QApplication.primaryScreen().geometry()
@@ -383,27 +2826,36 @@ This project is open source and available under the MIT License.
         self.move(x, y)
 
 class NoteWidget(QMainWindow):
-    def __init__(self, title, parent=None, on_delete=None, color_index=0, theme='light', on_color_change=None, main_window=None):
+    def __init__(self, record, parent=None, on_delete=None, theme='light', on_color_change=None, main_window=None):
         super().__init__(parent)
-        self.title = title
+        self.record = record
+        record.widget = self
         self._on_delete = None
-        self.is_visible = True
-        self.color_index = color_index
         self.theme = theme
         self.on_color_change = on_color_change
         self.main_window = main_window
         self.original_size = None
         self.default_size = QSize(400, 400)
+        # Drag and resize state: geometry is only committed to the record
+        # once the mouse is released
+        self._drag_pos = None
+        self._drag_target = None
+        self._snap_screens = ()
+        self._resizing = False
+        self._frame_timer = QTimer(self)
+        self._frame_timer.setSingleShot(True)
+        self._frame_timer.timeout.connect(self.apply_drag)
         self.setWindowFlags(Qt.FramelessWindowHint | Qt.Tool | Qt.WindowStaysOnTopHint)
         self.setAttribute(Qt.WA_TranslucentBackground)
         self.setup_ui()
         self.apply_color()
-        self.resize(self.default_size)
-        self._drag_pos = None
+        self.load_record()
         self.set_on_delete(on_delete)
-        
-        # Add keyboard shortcuts
-        self.setup_shortcuts()
+        self.text_edit.textChanged.connect(self.content_changed)
+        # The app's shared actions, so their shortcuts work while this note
+        # is the active window
+        if main_window is not None:
+            self.addActions(main_window.action_registry.all())
 
     def set_on_delete(self, callback):
         self._on_delete = callback
@@ -420,6 +2872,8 @@ class NoteWidget(QMainWindow):
 
     def setup_ui(self):
         central_widget = QWidget()
+        # Styled by the application stylesheet via dynamic properties
+        central_widget.setObjectName('noteBody')
         self.setCentralWidget(central_widget)
         layout = QVBoxLayout(central_widget)
         layout.setContentsMargins(8, 8, 8, 8)
@@ -430,7 +2884,7 @@ class NoteWidget(QMainWindow):
         header_layout.setSpacing(4)
         
         # Left section for editable title
-        self.title_edit = QLineEdit(self.title)
+        self.title_edit = QLineEdit(self.record.title)
         self.title_edit.setStyleSheet("font-weight: bold;")
         self.title_edit.setFrame(False)
         self.title_edit.setMaximumWidth(160)
@@ -442,6 +2896,7 @@ class NoteWidget(QMainWindow):
         font_section.setSpacing(2)
         font_section.setAlignment(Qt.AlignCenter)
         self.font_minus_btn = QToolButton()
+        self.font_minus_btn.setObjectName('font_minus_btn')
         self.font_minus_btn.setText('-')
         self.font_minus_btn.setToolTip('Decrease font size')
         self.font_minus_btn.clicked.connect(self.decrease_font_size)
@@ -453,6 +2908,7 @@ class NoteWidget(QMainWindow):
         self.font_size_edit.editingFinished.connect(self.font_size_edit_changed)
         font_section.addWidget(self.font_size_edit)
         self.font_plus_btn = QToolButton()
+        self.font_plus_btn.setObjectName('font_plus_btn')
         self.font_plus_btn.setText('+')
         self.font_plus_btn.setToolTip('Increase font size')
         self.font_plus_btn.clicked.connect(self.increase_font_size)
@@ -467,35 +2923,39 @@ class NoteWidget(QMainWindow):
         
         # Settings button
         self.settings_button = QToolButton()
-        self.settings_button.setIcon(QIcon(get_icon_pixmap('settings', self.theme)))
+        self.settings_button.setIcon(theme_resources.icon('settings', self.theme))
         self.settings_button.setToolTip('Settings')
         self.settings_button.clicked.connect(self.show_settings_menu)
         right_section.addWidget(self.settings_button)
         
         # Hide button
         self.hide_button = QToolButton()
-        self.hide_button.setIcon(QIcon(get_icon_pixmap('minimize', self.theme)))
+        self.hide_button.setIcon(theme_resources.icon('minimize', self.theme))
         self.hide_button.setToolTip('Hide')
         self.hide_button.clicked.connect(self.hide_note)
         right_section.addWidget(self.hide_button)
         
         # Color palette button
         self.palette_button = QToolButton()
-        self.palette_button.setIcon(QIcon(get_icon_pixmap('palette', self.theme)))
+        self.palette_button.setIcon(theme_resources.icon('palette', self.theme))
         self.palette_button.setToolTip('Change color')
         self.palette_button.clicked.connect(self.pick_color)
         right_section.addWidget(self.palette_button)
         
         # Delete button
         self.delete_button = QToolButton()
-        self.delete_button.setIcon(QIcon(get_icon_pixmap('delete', self.theme)))
+        self.delete_button.setIcon(theme_resources.icon('delete', self.theme))
         self.delete_button.setToolTip('Delete')
         right_section.addWidget(self.delete_button)
         
         header_layout.addLayout(right_section)
         layout.addLayout(header_layout)
         
-        self.text_edit = QTextEdit()
+        # Big bodies get the plain-text editor, which lays out lazily
+        if self.record.is_large():
+            self.text_edit = QPlainTextEdit()
+        else:
+            self.text_edit = QTextEdit()
         self.text_edit.setFont(QFont("Arial", DEFAULT_FONT_SIZE))
         layout.addWidget(self.text_edit)
         
@@ -509,130 +2969,140 @@ class NoteWidget(QMainWindow):
         # Add size grip
         self.size_grip = QSizeGrip(self)
         self.size_grip.setFixedSize(16, 16)
+        self.size_grip.installEventFilter(self)
         grip_layout.addWidget(self.size_grip)
         layout.addWidget(grip_container)
 
+    def mark_dirty(self):
+        # Tell the app this note has unsaved changes so it can schedule a save
+        if self.main_window:
+            self.main_window.note_changed(self.record)
+
+    def content_changed(self):
+        # Reading the document back is O(size), so the text is only copied
+        # into the record when the app is about to use it (see sync_content)
+        if self.main_window:
+            self.main_window.note_content_changed(self.record)
+
+    def sync_content(self):
+        self.record.content = self.text_edit.toPlainText()
+
+    def moveEvent(self, event):
+        super().moveEvent(event)
+        # Showing a note at its saved place moves it too; that is no change
+        pos = [self.x(), self.y()]
+        if self._drag_pos is None and not self._resizing and pos != self.record.pos:
+            self.record.pos = pos
+            self.geometry_changed()
+
+    def resizeEvent(self, event):
+        super().resizeEvent(event)
+        size = [self.width(), self.height()]
+        if self._drag_pos is None and not self._resizing and size != self.record.size:
+            self.record.size = size
+            self.geometry_changed()
+
+    def eventFilter(self, obj, event):
+        # QSizeGrip resizes the window itself; commit once when it lets go
+        if obj is self.size_grip:
+            if event.type() == QEvent.MouseButtonPress:
+                self._resizing = True
+            elif event.type() == QEvent.MouseButtonRelease and self._resizing:
+                self._resizing = False
+                self.commit_geometry()
+        return super().eventFilter(obj, event)
+
+    def commit_geometry(self):
+        pos = [self.x(), self.y()]
+        size = [self.width(), self.height()]
+        if pos != self.record.pos or size != self.record.size:
+            self.record.pos = pos
+            self.record.size = size
+            self.geometry_changed()
+
+    def geometry_changed(self):
+        if self.main_window:
+            self.main_window.note_geometry_changed(self.record)
+        self.mark_dirty()
+
     def hide_note(self):
         self.hide()
-        self.is_visible = False
+        self.record.is_visible = False
+        self.mark_dirty()
         if self.main_window:
             if hasattr(self.main_window, 'note_hidden_from_button'):
-                self.main_window.note_hidden_from_button(self)
+                self.main_window.note_hidden_from_button(self.record)
 
     def set_visible(self, visible):
-        self.is_visible = visible
+        if visible != self.record.is_visible:
+            self.record.is_visible = visible
+            self.mark_dirty()
         if visible:
             self.show()
         else:
             self.hide()
 
-    def get_data(self):
-        return {
-            "title": self.title,
-            "content": self.text_edit.toPlainText(),
-            "font_size": int(self.font_size_edit.text()),
-            "is_visible": self.is_visible,
-            "color_index": self.color_index,
-            "size": [self.width(), self.height()],
-            "pos": [self.x(), self.y()]
-        }
+    def load_record(self):
+        # Push the record into the freshly built widgets
+        record = self.record
+        self.text_edit.setPlainText(record.content)
+        if record.font_size != DEFAULT_FONT_SIZE:
+            self.font_size_edit.setText(str(record.font_size))
+            self.change_font_size(record.font_size)
+        self.load_geometry()
 
-    def set_data(self, data):
-        self.text_edit.setPlainText(data.get("content", ""))
-        font_size = data.get("font_size", DEFAULT_FONT_SIZE)
-        self.font_size_edit.setText(str(font_size))
-        self.change_font_size(font_size)
-        size = data.get("size")
-        if size:
+    def load_geometry(self):
+        record = self.record
+        size = record.size or [self.default_size.width(), self.default_size.height()]
+        if record.pos:
+            self.setGeometry(record.pos[0], record.pos[1], size[0], size[1])
+        else:
             self.resize(size[0], size[1])
-        pos = data.get("pos")
-        if pos:
-            self.move(pos[0], pos[1])
-        self.color_index = data.get("color_index", 0)
-        self.apply_color()
-        is_visible = data.get("is_visible", True)
-        self.set_visible(is_visible)
-        self.title = data.get("title", self.title)
-        self.title_edit.setText(self.title)
 
+    @metrics.timed("apply_color")
     def apply_color(self):
-        palette = get_pastel_palette(self.theme)
-        bg_rgb = palette[self.color_index % len(palette)]
-        font_color = get_contrast_font_color(bg_rgb)
-        border_col = '#888' if self.theme == 'light' else '#444'
-        btn_bg = '#eee' if self.theme == 'light' else '#222'
-        btn_fg = '#000' if self.theme == 'light' else '#fff'
-        self.centralWidget().setStyleSheet(f"""
-            QWidget {{
-                background-color: rgb{bg_rgb};
-                border: none;
-                border-radius: 14px;
-            }}
-            QLabel {{
-                color: {font_color};
-                background: transparent;
-            }}
-            QLineEdit {{
-                color: {font_color};
-                background: transparent;
-                border: none;
-                font-weight: bold;
-            }}
-            QTextEdit {{
-                background-color: rgb{bg_rgb};
-                color: {font_color};
-                border: none;
-                border-radius: 0px;
-            }}
-            QToolButton#font_minus_btn, QToolButton#font_plus_btn {{
-                border: 1.5px solid {border_col};
-                border-radius: 6px;
-                background: {btn_bg};
-                color: {btn_fg};
-                min-width: 22px;
-                min-height: 22px;
-            }}
-            QSpinBox {{
-                border: none;
-                background: transparent;
-            }}
-        """)
-        self.font_minus_btn.setObjectName('font_minus_btn')
-        self.font_plus_btn.setObjectName('font_plus_btn')
+        body = self.centralWidget()
+        body.setProperty('theme', self.theme)
+        body.setProperty('colorIndex', self.record.color_index % len(get_pastel_palette(self.theme)))
+        if body.testAttribute(Qt.WA_WState_Polished):
+            repolish(body)
 
     def change_font_size(self, size):
         font = self.text_edit.font()
         font.setPointSize(size)
         self.text_edit.setFont(font)
+        if size != self.record.font_size:
+            self.record.font_size = size
+            self.mark_dirty()
 
     def pick_color(self):
-        palette = get_pastel_palette(self.theme)
-        # Show a simple palette dialog
-        dlg = QDialog(self)
-        dlg.setWindowTitle("Pick a color")
-        l = QHBoxLayout(dlg)
-        btns = []
-        for i, rgb in enumerate(palette):
-            btn = QPushButton()
-            btn.setFixedSize(32, 32)
-            btn.setStyleSheet(f"background-color: rgb{rgb}; border-radius: 16px; border: 2px solid #888;")
-            btn.clicked.connect(lambda _, idx=i: dlg.done(idx+1))
-            l.addWidget(btn)
-            btns.append(btn)
-        dlg.setLayout(l)
-        res = dlg.exec_()
+        if self.main_window:
+            dlg = self.main_window.dialogs.get("color")
+            # Shared by all notes: lend it to this one while it is open, so
+            # it stacks above the note (which stays on top) and not below
+            dlg.setParent(self, dlg.windowFlags())
+            dlg.move(self.frameGeometry().center() - dlg.rect().center())
+            try:
+                res = dlg.exec_()
+            finally:
+                # Or it would be deleted along with this note
+                dlg.setParent(self.main_window, dlg.windowFlags())
+        else:
+            res = ColorPickerDialog(self.theme, self).exec_()
         if res > 0:
-            self.color_index = res-1
+            self.record.color_index = res-1
             self.apply_color()
+            self.mark_dirty()
             if self.on_color_change:
-                self.on_color_change(self.color_index)
+                self.on_color_change(self.record.color_index)
 
     def handle_title_change(self):
         new_title = self.title_edit.text()
-        if new_title != self.title:
-            self.title = new_title
+        if new_title != self.record.title:
+            self.record.title = new_title
+            self.mark_dirty()
             if self.main_window:
-                self.main_window.note_title_changed(self, new_title)
+                self.main_window.note_title_changed(self.record, new_title)
 
     def decrease_font_size(self):
         size = int(self.font_size_edit.text())
@@ -655,104 +3125,61 @@ class NoteWidget(QMainWindow):
     def mousePressEvent(self, event):
         if event.button() == Qt.LeftButton:
             self._drag_pos = event.globalPos() - self.frameGeometry().topLeft()
+            screen = QApplication.screenAt(event.globalPos()) or QApplication.primaryScreen()
+            # One move per display frame, however fast the mouse reports
+            self._frame_timer.setInterval(max(int(1000 / (screen.refreshRate() or 60)), 1))
+            self._snap_screens = [
+                (area.x(), area.y(), area.width(), area.height())
+                for area in (s.availableGeometry() for s in QApplication.screens())
+            ]
             event.accept()
 
     def mouseMoveEvent(self, event):
         if event.buttons() == Qt.LeftButton and self._drag_pos is not None:
-            self.move(event.globalPos() - self._drag_pos)
+            self._drag_target = (event.globalPos() - self._drag_pos, bool(event.modifiers() & Qt.ShiftModifier))
+            if not self._frame_timer.isActive():
+                self._frame_timer.start()
             event.accept()
 
+    def apply_drag(self):
+        if self._drag_target is None:
+            return
+        target, no_snap = self._drag_target
+        self._drag_target = None
+        x, y = target.x(), target.y()
+        if SNAP_DISTANCE and not no_snap:
+            x, y = snap_position(x, y, self.width(), self.height(), self.snap_rects(x, y), SNAP_DISTANCE)
+        if (x, y) != (self.x(), self.y()):
+            self.move(x, y)
+
+    def snap_rects(self, x, y):
+        # The app's placement grid still holds every note where it was last
+        # committed, which is exactly the cached layout a drag snaps to
+        rects = list(self._snap_screens)
+        app = self.main_window
+        if app is not None:
+            near = (x - SNAP_DISTANCE, y - SNAP_DISTANCE,
+                    self.width() + 2 * SNAP_DISTANCE, self.height() + 2 * SNAP_DISTANCE)
+            for note_id, rect in app.spatial.query(near).items():
+                record = app.records.get(note_id)
+                if note_id != self.record.id and record is not None and record.is_visible:
+                    rects.append(rect)
+        return rects
+
     def mouseReleaseEvent(self, event):
         if event.button() == Qt.LeftButton:
-            self._drag_pos = None
+            if self._drag_pos is not None:
+                self._frame_timer.stop()
+                self.apply_drag()
+                self._drag_pos = None
+                self.commit_geometry()
             event.accept()
 
     def show_settings_menu(self):
-        menu = QMenu(self)
-        
-        # New Note action
-        new_note_action = QAction("New Note", self)
-        new_note_action.triggered.connect(lambda: self.main_window.prompt_new_note() if self.main_window else None)
-        menu.addAction(new_note_action)
-        
-        # Show/Hide Notes action
-        showhide_action = QAction("Show/Hide Notes", self)
-        showhide_action.triggered.connect(lambda: self.main_window.open_showhide_dialog() if self.main_window else None)
-        menu.addAction(showhide_action)
-        
-        # Show All Notes action
-        show_all_action = QAction("Show All Notes", self)
-        show_all_action.triggered.connect(lambda: self.main_window.show_all_notes() if self.main_window else None)
-        menu.addAction(show_all_action)
-        
-        # Hide All Notes action
-        hide_all_action = QAction("Hide All Notes", self)
-        hide_all_action.triggered.connect(lambda: self.main_window.hide_all_notes() if self.main_window else None)
-        menu.addAction(hide_all_action)
-        
-        # Theme toggle action
-        theme_action = QAction("Toggle Theme", self)
-        theme_action.triggered.connect(lambda: self.main_window.toggle_theme() if self.main_window else None)
-        menu.addAction(theme_action)
-        
-        menu.addSeparator()
-        
-        # Add About action
-        about_action = QAction("About", self)
-        about_action.triggered.connect(lambda: self.main_window.show_readme() if self.main_window else None)
-        menu.addAction(about_action)
-        
-        menu.addSeparator()
-        
-        # Exit action
-        exit_action = QAction("Exit", self)
-        exit_action.triggered.connect(lambda: self.main_window.quit_app() if self.main_window else None)
-        menu.addAction(exit_action)
-        
-        # Apply theme-based styling
-        font_color = '#fff' if self.theme == 'dark' else '#000'
-        bg_color = '#222' if self.theme == 'dark' else '#fff'
-        btn_bg = '#333' if self.theme == 'dark' else '#eee'
-        btn_fg = '#fff' if self.theme == 'dark' else '#000'
-        
-        menu.setStyleSheet(f"""
-            QMenu {{
-                background: {bg_color};
-                color: {font_color};
-                border: 1px solid #888;
-            }}
-            QMenu::item {{
-                padding: 5px 20px;
-            }}
-            QMenu::item:selected {{
-                background: {btn_bg};
-                color: {btn_fg};
-            }}
-        """)
-        
-        # Show menu at button position
-        menu.exec_(self.settings_button.mapToGlobal(self.settings_button.rect().bottomLeft()))
-
-    def setup_shortcuts(self):
-        # New note shortcut
-        new_note_shortcut = QShortcut(QKeySequence("Ctrl+N"), self)
-        new_note_shortcut.activated.connect(lambda: self.main_window.prompt_new_note() if self.main_window else None)
-        
-        # Hide note shortcut
-        hide_note_shortcut = QShortcut(QKeySequence("Ctrl+H"), self)
-        hide_note_shortcut.activated.connect(self.hide_note)
-        
-        # Show/Hide dialog shortcut
-        showhide_shortcut = QShortcut(QKeySequence("Ctrl+S"), self)
-        showhide_shortcut.activated.connect(lambda: self.main_window.open_showhide_dialog() if self.main_window else None)
-        
-        # Info/Readme shortcut
-        info_shortcut = QShortcut(QKeySequence("Ctrl+I"), self)
-        info_shortcut.activated.connect(lambda: self.show_readme() if self.main_window else None)
-    
-    def show_readme(self):
+        # One menu, built once by the app, serves every note
         if self.main_window:
-            self.main_window.show_readme()
+            pos = self.settings_button.mapToGlobal(self.settings_button.rect().bottomLeft())
+            self.main_window.action_registry.popup_settings_menu(self, pos)
 
 class NewNoteDialog(QDialog):
     def __init__(self, theme, parent=None):
@@ -769,33 +3196,304 @@ class NewNoteDialog(QDialog):
         btn_box.rejected.connect(self.reject)
         layout.addWidget(btn_box)
         # Theming
-        font_color = '#fff' if theme == 'dark' else '#000'
-        bg_color = '#222' if theme == 'dark' else '#fff'
-        btn_bg = '#333' if theme == 'dark' else '#eee'
-        btn_fg = '#fff' if theme == 'dark' else '#000'
-        self.setStyleSheet(f"""
-            QDialog {{ background: {bg_color}; color: {font_color}; }}
-            QLabel {{ color: {font_color}; }}
-            QLineEdit {{ color: {font_color}; background: transparent; border: 1px solid #888; }}
-            QDialogButtonBox QPushButton {{ color: {btn_fg}; background: {btn_bg}; border-radius: 6px; border: 1px solid #888; }}
-        """)
+        self.apply_theme(theme)
+
+    def apply_theme(self, theme):
+        self.setStyleSheet(theme_resources.stylesheet('new_note', theme))
+
+    def reset(self):
+        self.title_edit.clear()
+        self.title_edit.setFocus()
 
     def get_title(self):
         return self.title_edit.text().strip()
 
+class ColorPickerDialog(QDialog):
+    """A row of palette swatches; exec_() returns the picked index + 1, or 0."""
+
+    def __init__(self, theme, parent=None):
+        super().__init__(parent)
+        self.setWindowTitle("Pick a color")
+        layout = QHBoxLayout(self)
+        self.swatches = []
+        for i in range(len(get_pastel_palette(theme))):
+            btn = QPushButton()
+            btn.setFixedSize(32, 32)
+            btn.clicked.connect(lambda _, idx=i: self.done(idx+1))
+            layout.addWidget(btn)
+            self.swatches.append(btn)
+        self.apply_theme(theme)
+
+    def apply_theme(self, theme):
+        for i, btn in enumerate(self.swatches):
+            btn.setStyleSheet(theme_resources.stylesheet('swatch', theme, i))
+
+class DialogPool:
+    """The app's modal dialogs, each built once and reused.
+
+    A dialog is built on first use, or ahead of time by prewarm() while the
+    event loop is idle after startup. Callers reset a dialog before showing
+    it; the theme is pushed to the built ones only by apply_theme().
+    """
+
+    def __init__(self, app):
+        self.app = app
+        self._dialogs = {}
+        self._factories = {
+            "new_note": lambda: NewNoteDialog(app.theme, parent=None),
+            "delete": self._build_delete_confirmation,
+            "color": lambda: ColorPickerDialog(app.theme, app),
+            "readme": lambda: ReadmeDialog(app.theme, app),
+        }
+        self._prewarm_timer = QTimer(app)
+        self._prewarm_timer.setInterval(0)
+        self._prewarm_timer.timeout.connect(self._prewarm_next)
+
+    def get(self, name):
+        dialog = self._dialogs.get(name)
+        if dialog is None:
+            with metrics.span("dialog." + name):
+                dialog = self._dialogs[name] = self._factories[name]()
+        return dialog
+
+    def prewarm(self):
+        """Build the missing dialogs, one per idle event-loop turn."""
+        self._prewarm_timer.start()
+
+    def _prewarm_next(self):
+        # Startup windows come first
+        if self.app._startup_queue:
+            return
+        missing = [name for name in self._factories if name not in self._dialogs]
+        if missing:
+            self.get(missing[0])
+        if len(missing) <= 1:
+            self._prewarm_timer.stop()
+
+    def apply_theme(self, theme):
+        for name, dialog in self._dialogs.items():
+            if name == "delete":
+                dialog.setStyleSheet(theme_resources.stylesheet('message_box', theme))
+            else:
+                dialog.apply_theme(theme)
+
+    def _build_delete_confirmation(self):
+        msg_box = QMessageBox(self.app)
+        msg_box.setWindowTitle("Delete Note")
+        msg_box.setStandardButtons(QMessageBox.Yes | QMessageBox.No)
+        msg_box.setStyleSheet(theme_resources.stylesheet('message_box', self.app.theme))
+        return msg_box
+
+class InstanceServer(QLocalServer):
+    """Accepts the requests of later launches for the running instance.
+
+    Each connection sends one JSON line; it is answered with "ok" and the
+    request is run from the event loop through handler.
+    """
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.handler = None
+        self.newConnection.connect(self._accept)
+
+    def start(self):
+        """Listen, taking over a socket left behind by a crashed instance.
+
+        Returns False if another instance is listening already.
+        """
+        if self.listen(INSTANCE_SERVER_NAME):
+            return True
+        if self.serverError() == QAbstractSocket.AddressInUseError:
+            if send_to_running_instance({"command": "ping"}):
+                return False
+            QLocalServer.removeServer(INSTANCE_SERVER_NAME)
+            return self.listen(INSTANCE_SERVER_NAME)
+        logger.warning("Single-instance server unavailable: %s", self.errorString())
+        return True
+
+    def _accept(self):
+        while self.hasPendingConnections():
+            socket = self.nextPendingConnection()
+            socket.readyRead.connect(lambda s=socket: self._read(s))
+            socket.disconnected.connect(socket.deleteLater)
+
+    def _read(self, socket):
+        if not socket.canReadLine():
+            return
+        try:
+            command = json.loads(bytes(socket.readLine()).decode("utf-8"))
+        except ValueError:
+            socket.disconnectFromServer()
+            return
+        socket.write(b"ok\n")
+        socket.flush()
+        if self.handler is not None and command.get("command") != "ping":
+            QTimer.singleShot(0, lambda: self.handler(command))
+
+class ActionRegistry:
+    """The app's shared QActions, one per command.
+
+    Notes, the tray and the note settings menu all use these same actions
+    instead of building their own, and shortcuts are bound here once, with
+    an application-wide context. Commands about a single note act on the
+    note whose settings menu is open, or else on the active note window.
+    """
+
+    SETTINGS_MENU = ("new_note", "show_hide", "search", "show_all", "hide_all",
+                     "toggle_theme", "history", None, "about", None, "exit")
+    TRAY_MENU = ("new_note", "show_hide", "search", "show_all", "hide_all", "bring_notes",
+                 "arrange", "toggle_theme", "profiling", "export_metrics", None, "about", None, "exit")
+
+    def __init__(self, app, shortcuts=DEFAULT_SHORTCUTS):
+        self.app = app
+        self.menu_note = None
+        self._actions = {}
+        for name, text, handler in (
+            ("new_note", "New Note", app.prompt_new_note),
+            ("hide_note", "Hide Note", lambda: self._for_note(lambda note: note.hide_note())),
+            ("show_hide", "Show/Hide Notes", app.open_showhide_dialog),
+            ("search", "Search Notes...", app.open_search_dialog),
+            ("show_all", "Show All Notes", app.show_all_notes),
+            ("hide_all", "Hide All Notes", app.hide_all_notes),
+            ("bring_notes", "Bring Notes to This Workspace", app.bring_notes_to_workspace),
+            ("arrange", "Arrange Notes", app.arrange_notes),
+            ("toggle_theme", "Toggle Theme", app.toggle_theme),
+            ("history", "History...", lambda: self._for_note(lambda note: app.open_history_dialog(note.record))),
+            # --profile starts the profiler before the app is built
+            ("profiling", "Stop Profiling" if profiler.active else "Start Profiling", app.toggle_profiling),
+            ("export_metrics", "Export Metrics", lambda: app.export_metrics()),
+            ("about", "About", app.show_readme),
+            ("exit", "Exit", app.quit_app),
+        ):
+            action = QAction(text, app)
+            action.setShortcutContext(Qt.ApplicationShortcut)
+            action.triggered.connect(lambda checked=False, handler=handler: handler())
+            self._actions[name] = action
+        for name, sequence in shortcuts.items():
+            self.set_shortcut(name, sequence)
+        self._actions["export_metrics"].setVisible(metrics.enabled)
+        # Shortcuts only fire for actions attached to a visible widget
+        app.addActions(self.all())
+        self.settings_menu = self.build_menu(self.SETTINGS_MENU, app)
+        self.apply_theme(app.theme)
+
+    def __getitem__(self, name):
+        return self._actions[name]
+
+    def all(self):
+        return list(self._actions.values())
+
+    def set_shortcut(self, name, sequence):
+        """Rebind the shortcut of one action; an empty sequence removes it."""
+        self._actions[name].setShortcut(QKeySequence(sequence))
+
+    def build_menu(self, names, parent=None):
+        menu = QMenu(parent)
+        for name in names:
+            if name is None:
+                menu.addSeparator()
+            else:
+                menu.addAction(self._actions[name])
+        return menu
+
+    def apply_theme(self, theme):
+        self.settings_menu.setStyleSheet(theme_resources.stylesheet('menu', theme))
+
+    def current_note(self):
+        if self.menu_note is not None:
+            return self.menu_note
+        window = QApplication.activeWindow()
+        return window if isinstance(window, NoteWidget) else None
+
+    def _for_note(self, func):
+        note = self.current_note()
+        if note is not None:
+            func(note)
+
+    def popup_settings_menu(self, note, pos):
+        self.menu_note = note
+        try:
+            self.settings_menu.exec_(pos)
+        finally:
+            self.menu_note = None
+
 class StickyNotesApp(QMainWindow):
     def __init__(self):
         super().__init__()
         self.theme = 'dark'
-        self.notes = []
+        # Note records in display order, keyed by their stable id
+        self.records = {}
+        self._pending_content = set()
+        self.search_index = NoteSearchIndex()
+        self.spatial = SpatialGrid()
+        self._unindexed = set()
+        self.search_dialog = None
         self.showhide_dialog = None
+        self.notes_model = NotesListModel(self)
+        # Autosave is change-driven: edits mark the app dirty and arm a
+        # single-shot timer, so an idle instance never wakes up or writes.
+        self._dirty = False
+        self._loading = False
+        self.save_counters = {
+            "changes": 0,    # change notifications received from notes
+            "wakeups": 0,    # autosave timer firings
+            "snapshots": 0,  # snapshots handed to the save worker
+            "skipped": 0,    # save requests with nothing to write
+        }
+        self.install_application_stylesheet()
+        self.action_registry = ActionRegistry(self)
         self.setup_tray_icon_and_menu()
         self.tray_icon.show()
+        logger.debug("time to tray: %.1f ms", (time.perf_counter() - _PROCESS_START) * 1000)
+        # Note windows still to be built after startup, nearest first
+        self._startup_queue = []
+        self._startup_timer = QTimer(self)
+        self._startup_timer.setInterval(0)
+        self._startup_timer.timeout.connect(self._materialise_batch)
+        self._first_note_logged = False
+        # Loaded notes are indexed for search a batch at a time once the
+        # startup windows are built
+        self._index_timer = QTimer(self)
+        self._index_timer.setInterval(0)
+        self._index_timer.timeout.connect(self._index_batch)
+        # (record, source, token chunks, tokens so far) of a large body
+        # being indexed across several turns; it stays in _unindexed
+        self._index_job = None
+        self.dialogs = DialogPool(self)
         self.save_timer = QTimer(self)
-        self.save_timer.timeout.connect(self.save_notes)
-        self.save_timer.start(SAVE_INTERVAL)
+        self.save_timer.setSingleShot(True)
+        self.save_timer.setInterval(SAVE_INTERVAL)
+        self.save_timer.timeout.connect(self._autosave)
+        self.store = open_store()
+        self.blobs = NoteBlobs(BLOB_DIR)
+        self.history = NoteHistory()
+        self.history.load(HISTORY_FILE)
+        self._history_pending = set()
+        self.save_worker = SaveWorker(self.store, self.blobs, HISTORY_FILE, self)
+        self.save_worker.external_change.connect(self.schedule_external_check)
+        self.save_worker.external_notes.connect(self.apply_external_changes)
+        self.save_worker.start()
+        # Snapshot sequence numbers; _edited maps a note id to the first
+        # snapshot holding its latest local change, so a note is unsaved
+        # while that is newer than save_worker.written_seq
+        self._save_seq = 0
+        self._edited = {}
+        # Session logout and the like quit without going through quit_app()
+        QApplication.instance().aboutToQuit.connect(self.shutdown)
         self.load_notes()
         self.update_tooltip_style()
+        # Other instances or scripts editing the save files
+        self._external_timer = QTimer(self)
+        self._external_timer.setSingleShot(True)
+        self._external_timer.setInterval(EXTERNAL_CHANGE_DELAY)
+        self._external_timer.timeout.connect(self.check_external_changes)
+        self.watcher = QFileSystemWatcher(self)
+        self.watcher.directoryChanged.connect(self.save_directory_changed)
+        self.watcher.fileChanged.connect(self.schedule_external_check)
+        self._watched_signature = None
+        self.watch_save_files()
+        if PREWARM_DIALOGS:
+            self.dialogs.prewarm()
 
     def setup_tray_icon_and_menu(self):
         if hasattr(self, 'tray_icon') and self.tray_icon is not None:
@@ -804,263 +3502,750 @@ class StickyNotesApp(QMainWindow):
             self.tray_icon = None
 
         self.tray_icon = QSystemTrayIcon(self)
-        self.tray_icon.setIcon(QIcon(create_sticky_note_icon(self.theme)))
-        tray_menu = QMenu()
-        new_note_action = QAction("New Note", self)
-        new_note_action.triggered.connect(self.prompt_new_note)
-        tray_menu.addAction(new_note_action)
-        # Add static Show/Hide Notes action
-        showhide_action = QAction("Show/Hide Notes", self)
-        showhide_action.triggered.connect(self.open_showhide_dialog)
-        tray_menu.addAction(showhide_action)
-        show_all_action = QAction("Show All Notes", self)
-        show_all_action.triggered.connect(self.show_all_notes)
-        tray_menu.addAction(show_all_action)
-        hide_all_action = QAction("Hide All Notes", self)
-        hide_all_action.triggered.connect(self.hide_all_notes)
-        tray_menu.addAction(hide_all_action)
-        bring_notes_action = QAction("Bring Notes to This Workspace", self)
-        bring_notes_action.triggered.connect(self.bring_notes_to_workspace)
-        tray_menu.addAction(bring_notes_action)
-        # Add theme and exit actions
-        self.theme_action = QAction("Toggle Theme", self)
-        self.theme_action.triggered.connect(self.toggle_theme)
-        tray_menu.addAction(self.theme_action)
-        tray_menu.addSeparator()
-        # Add About action
-        about_action = QAction("About", self)
-        about_action.triggered.connect(self.show_readme)
-        tray_menu.addAction(about_action)
-        tray_menu.addSeparator()
-        exit_action = QAction("Exit", self)
-        exit_action.triggered.connect(self.quit_app)
-        tray_menu.addAction(exit_action)
+        self.tray_icon.setIcon(theme_resources.icon('tray', self.theme))
+        tray_menu = self.action_registry.build_menu(ActionRegistry.TRAY_MENU)
         self.tray_icon.setContextMenu(tray_menu)
         self.tray_icon.show()
 
     def prompt_new_note(self):
-        if len(self.notes) >= MAX_NOTES:
+        if len(self.records) >= MAX_NOTES:
             QMessageBox.warning(self, "Maximum Notes Reached", f"You can only create up to {MAX_NOTES} notes.")
             return
-        dlg = NewNoteDialog(self.theme, parent=None)
+        dlg = self.dialogs.get("new_note")
+        dlg.reset()
         if dlg.exec_() == QDialog.Accepted:
             title = dlg.get_title()
             if title:
                 self.add_note(title)
 
     def add_note(self, title, pos=None, size=None):
-        print(f"[LOG] Adding note: {title}")
-        if len(self.notes) >= MAX_NOTES:
+        logger.info("Adding note: %s", title)
+        if len(self.records) >= MAX_NOTES:
             QMessageBox.warning(self, "Maximum Notes Reached", f"You can only create up to {MAX_NOTES} notes.")
             return
-        color_index = len(self.notes) % len(get_pastel_palette(self.theme))
-        note_widget = NoteWidget(title, parent=None, color_index=color_index, theme=self.theme, main_window=self)
-        note_widget.set_on_delete(lambda *args, widget=note_widget: self.delete_note(widget))
-        note_widget.on_color_change = lambda idx, w=note_widget: self.update_note_color(w, idx)
-        if size:
-            note_widget.resize(size[0], size[1])
-        if pos:
-            note_widget.move(pos[0], pos[1])
-        else:
-            # Get screen geometry
-            screen = QApplication.primaryScreen().geometry()
-            margin = 20
-            note_width = note_widget.width()
-            note_height = note_widget.height()
-            
-            # Try to find a non-overlapping position
-            found_position = False
-            for row in range(3):  # Try 3 rows
-                for col in range(3):  # Try 3 columns
-                    x = margin + col * (note_width + margin)
-                    y = margin + row * (note_height + margin)
-                    
-                    # Check if this position overlaps with any existing note
-                    overlaps = False
-                    for note in self.notes:
-                        if (abs(note.x() - x) < note_width and 
-                            abs(note.y() - y) < note_height):
-                            overlaps = True
-                            break
-                    
-                    if not overlaps:
-                        note_widget.move(x, y)
-                        found_position = True
-                        break
-                if found_position:
-                    break
-            
-            # If no non-overlapping position found, use a random position
-            if not found_position:
-                x = margin + (len(self.notes) * 30) % (screen.width() - note_width - margin)
-                y = margin + (len(self.notes) * 30) % (screen.height() - note_height - margin)
-                note_widget.move(x, y)
+        color_index = len(self.records) % len(get_pastel_palette(self.theme))
+        record = NoteRecord(title=title, color_index=color_index, size=size, pos=pos)
+        note_widget = self._create_note_widget(record)
+        if not pos:
+            x, y = self.find_free_position(note_widget.width(), note_widget.height())
+            note_widget.move(x, y)
+            record.pos = [x, y]
         
-        self.notes.append(note_widget)
+        self.records[record.id] = record
+        self.search_index.update(record.id, record.title)
+        self.note_geometry_changed(record)
+        self.notes_model.note_added(record)
         note_widget.show()
-        print(f"[LOG] Notes after add: {[n.title for n in self.notes]}")
-        self.save_notes()
+        logger.debug("%d notes after add", len(self.records))
+        self.note_changed(record)
+
+    def find_free_position(self, width, height):
+        """Top-left corner of the first free spot on any screen.
+
+        Screens are tried starting with the one under the cursor, top to
+        bottom and left to right. Every probe is a grid query, and a blocked
+        probe jumps past the note in the way.
+        """
+        margin = NOTE_MARGIN
+        for area in screens_by_cursor():
+            y = area.top() + margin
+            while y + height <= area.bottom() - margin:
+                x = area.left() + margin
+                while x + width <= area.right() - margin:
+                    # Grow the probe by the margin so placed notes keep a gap
+                    hits = self.spatial.query((x - margin, y - margin, width + 2 * margin, height + 2 * margin))
+                    if not hits:
+                        return x, y
+                    x = max(hx + hw for hx, hy, hw, hh in hits.values()) + margin
+                y += PLACEMENT_ROW_STEP
+        # Every screen is full: cascade over the primary screen
+        screen = QApplication.primaryScreen().availableGeometry()
+        offset = len(self.records) * 30
+        x = screen.left() + margin + offset % max(screen.width() - width - margin, 1)
+        y = screen.top() + margin + offset % max(screen.height() - height - margin, 1)
+        return x, y
+
+    def note_geometry_changed(self, record):
+        if record.pos and record.id in self.records:
+            size = record.size or [400, 400]
+            self.spatial.update(record.id, (record.pos[0], record.pos[1], size[0], size[1]))
+
+    def arrange_notes(self):
+        """Pack every visible note into rows across the screens, without overlap."""
+        self.finish_materialising()
+        visible = [record for record in self.records.values() if record.is_visible and record.widget]
+        margin = NOTE_MARGIN
+        areas = screens_by_cursor()
+        placements = []
+        area_index = 0
+        area = areas[0]
+        x = area.left() + margin
+        y = area.top() + margin
+        row_height = 0
+        overflow = 0
+        for record in visible:
+            width = record.widget.width()
+            height = record.widget.height()
+            if x + width > area.right() - margin and x > area.left() + margin:
+                # Start a new row
+                x = area.left() + margin
+                y += row_height + margin
+                row_height = 0
+            if y + height > area.bottom() - margin and y > area.top() + margin:
+                # This screen is full; continue on the next one
+                area_index += 1
+                if area_index == len(areas):
+                    # Out of room everywhere: start over with a small offset
+                    area_index = 0
+                    overflow += 1
+                area = areas[area_index]
+                x = area.left() + margin + overflow * 30
+                y = area.top() + margin + overflow * 30
+                row_height = 0
+            placements.append((record, x, y))
+            x += width + margin
+            row_height = max(row_height, height)
+        # One move per window, after the whole layout is known
+        for record, x, y in placements:
+            record.widget.move(x, y)
+
+    def load_note_body(self, record):
+        # Large bodies are only read from their file once the note is shown
+        if record.content is None:
+            try:
+                record.content = self.blobs.read(record.blob)
+            except OSError as e:
+                logger.error("Error loading note body: %s", e)
+                record.content = ""
+                record.blob = None
+            self._unindexed.add(record)
+
+    def _create_note_widget(self, record):
+        metrics.count("notes_materialised")
+        self.load_note_body(record)
+        note_widget = NoteWidget(record, parent=None, theme=self.theme, main_window=self)
+        note_widget.set_on_delete(lambda *args, r=record: self.delete_note(r))
+        note_widget.on_color_change = lambda idx, r=record: self.update_note_color(r, idx)
+        return note_widget
+
+    def _materialise_notes(self, notes_data):
+        # Build every record from the parsed data in one pass: no placement
+        # search, no per-note save, and indexing is left to the idle timer.
+        # Hidden notes stay as plain records until they are first shown; the
+        # windows of visible ones are built a batch at a time from the event
+        # loop, starting with the notes nearest the cursor.
+        queue = []
+        for note_data in notes_data:
+            record = NoteRecord.from_data(note_data)
+            self.records[record.id] = record
+            self._unindexed.add(record)
+            self.note_geometry_changed(record)
+            if record.is_visible:
+                queue.append(record)
+        cursor = QCursor.pos()
+        def distance(record):
+            if not record.pos:
+                return 0
+            size = record.size or [400, 400]
+            dx = record.pos[0] + size[0] // 2 - cursor.x()
+            dy = record.pos[1] + size[1] // 2 - cursor.y()
+            return dx * dx + dy * dy
+        queue.sort(key=distance, reverse=True)
+        # Farthest first: batches pop from the end
+        self._startup_queue = queue
+        if queue:
+            self._startup_timer.start()
+        else:
+            self._startup_timer.stop()
+        self._index_timer.start()
+
+    def _materialise_batch(self):
+        built = 0
+        while self._startup_queue and built < STARTUP_BATCH_SIZE:
+            record = self._startup_queue.pop()
+            # Hidden or already shown in the meantime
+            if record.widget or not record.is_visible or record.id not in self.records:
+                continue
+            self.materialise_note(record).show()
+            built += 1
+            if not self._first_note_logged:
+                self._first_note_logged = True
+                logger.debug("time to first note: %.1f ms", (time.perf_counter() - _PROCESS_START) * 1000)
+        if not self._startup_queue:
+            self._startup_timer.stop()
+            logger.debug("all notes shown: %.1f ms", (time.perf_counter() - _PROCESS_START) * 1000)
+
+    def finish_materialising(self):
+        """Build the remaining startup windows now, for whole-layout commands."""
+        while self._startup_queue:
+            self._materialise_batch()
+
+    def materialise_note(self, record):
+        """Build the window for a record that does not have one yet."""
+        self._loading = True
+        try:
+            return self._create_note_widget(record)
+        finally:
+            self._loading = False
+
+    def set_note_visible(self, record, visible):
+        if record.widget is None:
+            if not visible:
+                if record.is_visible:
+                    # Still waiting for its window in the startup queue
+                    record.is_visible = False
+                    self.notes_model.note_updated(record)
+                    self.note_changed(record)
+                return
+            self.materialise_note(record)
+        record.widget.set_visible(visible)
+        self.notes_model.note_updated(record)
 
-    def update_note_color(self, note_widget, color_index):
-        note_widget.color_index = color_index
-        note_widget.apply_color()
+    def set_notes_visible(self, records, visible):
+        # Apply as one batch: a single model update instead of one per row
+        self.notes_model.begin_batch()
+        try:
+            for record in records:
+                self.set_note_visible(record, visible)
+        finally:
+            self.notes_model.end_batch()
+
+    def update_note_color(self, record, color_index):
+        record.color_index = color_index
+        if record.widget:
+            record.widget.apply_color()
+        self.notes_model.note_updated(record)
 
-    def delete_note(self, note_widget):
-        print(f"[LOG] Deleting note: {note_widget.title}")
+    def delete_note(self, record):
+        logger.info("Deleting note: %s", record.title)
         menu = self.tray_icon.contextMenu()
+        blocked = []
         if menu and menu.isVisible():
-            print("[LOG] Hiding tray menu before deletion.")
+            logger.debug("Hiding tray menu and blocking its actions before deletion")
             menu.hide()
-            for action in menu.actions():
-                print(f"[LOG] Blocking signals for action: {action.text()}")
-                action.blockSignals(True)
-        
-        # Create and style the message box
-        msg_box = QMessageBox(self)
-        msg_box.setWindowTitle("Delete Note")
-        msg_box.setText(f"Are you sure you want to delete '{note_widget.title}'?")
-        msg_box.setStandardButtons(QMessageBox.Yes | QMessageBox.No)
-        
-        # Apply theme-based styling
-        font_color = '#fff' if self.theme == 'dark' else '#000'
-        bg_color = '#222' if self.theme == 'dark' else '#fff'
-        btn_bg = '#333' if self.theme == 'dark' else '#eee'
-        btn_fg = '#fff' if self.theme == 'dark' else '#000'
-        btn_hover = '#444' if self.theme == 'dark' else '#ddd'
-        
-        msg_box.setStyleSheet(f"""
-            QMessageBox {{
-                background: {bg_color};
-                color: {font_color};
-            }}
-            QMessageBox QLabel {{
-                color: {font_color};
-            }}
-            QPushButton {{
-                color: {btn_fg};
-                background: {btn_bg};
-                border-radius: 6px;
-                border: 1px solid #888;
-                padding: 5px 15px;
-            }}
-            QPushButton:hover {{
-                background: {btn_hover};
-            }}
-        """)
+            # The actions are shared with the notes, so unblock them after
+            blocked = [action for action in menu.actions() if not action.blockSignals(True)]
         
+        msg_box = self.dialogs.get("delete")
+        msg_box.setText(f"Are you sure you want to delete '{record.title}'?")
         reply = msg_box.exec_()
+        for action in blocked:
+            action.blockSignals(False)
         if reply == QMessageBox.Yes:
-            self.notes.remove(note_widget)
-            note_widget.deleteLater()
-            print(f"[LOG] Notes after delete: {[n.title for n in self.notes]}")
-            if self.showhide_dialog:
-                self.showhide_dialog.close()
-            self.showhide_dialog = None
-            self.save_notes()
+            self.remove_record(record)
+            logger.debug("%d notes after delete", len(self.records))
+            self.note_changed(record)
+
+    def remove_record(self, record):
+        del self.records[record.id]
+        self._pending_content.discard(record)
+        self._unindexed.discard(record)
+        self.search_index.remove(record.id)
+        self.spatial.remove(record.id)
+        self._history_pending.discard(record)
+        self.history.remove(record.id)
+        if record.widget:
+            record.widget.deleteLater()
+            record.widget = None
+        self.notes_model.note_removed(record.id)
 
     def show_all_notes(self):
-        for note in self.notes:
-            note.set_visible(True)
+        self.set_notes_visible(list(self.records.values()), True)
 
     def hide_all_notes(self):
-        for note in self.notes:
-            note.set_visible(False)
+        self.set_notes_visible(list(self.records.values()), False)
 
     def open_showhide_dialog(self):
-        if self.showhide_dialog is None or not self.showhide_dialog.isVisible():
-            self.showhide_dialog = ShowHideDialog(self.notes, self)
+        # Built once and kept; the shared model keeps it current
+        if self.showhide_dialog is None:
+            with metrics.span("dialog.showhide"):
+                self.showhide_dialog = ShowHideDialog(self.notes_model, self)
             self.showhide_dialog.finished.connect(self._on_showhide_dialog_closed)
+        if not self.showhide_dialog.isVisible():
             self.showhide_dialog.exec_()
 
     def _on_showhide_dialog_closed(self, result):
-        print("[LOG] Show/Hide dialog closed.")
-        self.showhide_dialog = None
+        logger.debug("Show/Hide dialog closed")
 
-    def note_hidden_from_button(self, note):
-        if self.showhide_dialog:
-            self.showhide_dialog.set_checkbox(note, False)
+    def note_hidden_from_button(self, record):
+        self.notes_model.note_updated(record)
 
+    @metrics.timed("load_notes")
     def load_notes(self):
-        if os.path.exists(SAVE_FILE):
+        try:
+            with FileLock(LOCK_FILE):
+                theme, notes_data = self.store.load()
+                self.save_worker.set_signature(files_signature(self.store.paths()))
+        except Exception as e:
+            # Damaged files were moved aside by the store; anything else (a
+            # newer format, an unreadable file) would be overwritten by the
+            # next save, so stop before writing anything
+            logger.exception("Error loading notes: %s", e)
+            self.save_worker.stop()
+            QMessageBox.critical(None, "Sticky Notes", f"Could not load the saved notes:\n{e}")
+            sys.exit(f"Could not load the saved notes: {e}")
+        self._loading = True
+        try:
+            # Load theme first
+            self.theme = theme
+            theme_resources.set_theme(theme)
+            # Update UI for theme
+            self.update_tooltip_style()
+            self.tray_icon.setIcon(theme_resources.icon('tray', self.theme))
+
+            for record in self.records.values():
+                if record.widget:
+                    record.widget.deleteLater()
+            self.records.clear()
+            self._pending_content.clear()
+            self._unindexed.clear()
+            self.search_index.clear()
+            self.spatial.clear()
+            self._materialise_notes(notes_data)
+            self.notes_model.reset()
+        except Exception as e:
+            logger.exception("Error loading notes: %s", e)
+        finally:
+            self._loading = False
+            self._dirty = False
+
+    def note_changed(self, record=None):
+        self.save_counters["changes"] += 1
+        if self._loading:
+            return
+        if record is not None:
+            self._edited[record.id] = self._save_seq + 1
+        self._dirty = True
+        # Coalesce a burst of edits into one save at most SAVE_INTERVAL later
+        if not self.save_timer.isActive():
+            self.save_timer.start()
+
+    def note_content_changed(self, record):
+        if record not in self._history_pending:
+            if not self.history.has(record.id):
+                # The record still holds the text from before this edit
+                self.history.record(record.id, record.content)
+            self._history_pending.add(record)
+        self._pending_content.add(record)
+        # Re-tokenised lazily, on the next search
+        self._unindexed.add(record)
+        self.note_changed(record)
+
+    def _index_record(self, record):
+        if record.content is None and record.blob:
+            # A large body not loaded yet is tokenised from its file, so
+            # it is searchable without being kept in memory
             try:
-                with open(SAVE_FILE, 'r') as f:
-                    data = json.load(f)
-                    # Load theme first
-                    self.theme = data.get("theme", "dark")
-                    # Update UI for theme
-                    self.update_tooltip_style()
-                    self.tray_icon.setIcon(QIcon(create_sticky_note_icon(self.theme)))
-                    
-                    for note in self.notes:
-                        note.deleteLater()
-                    self.notes.clear()
-                    for note_data in data["notes"]:
-                        pos = note_data.get("pos")
-                        size = note_data.get("size")
-                        self.add_note(note_data["title"], pos=pos, size=size)
-                        self.notes[-1].set_data(note_data)
-            except Exception as e:
-                print(f"Error loading notes: {e}")
+                body_tokens = self.search_index.tokenize_file(os.path.join(self.blobs.directory, record.blob))
+            except (OSError, ValueError) as e:
+                logger.error("Error indexing note body: %s", e)
+                body_tokens = ()
+            self.search_index.update(record.id, record.title, body_tokens)
+        else:
+            self.search_index.update(record.id, record.title + "\n" + (record.content or ""))
+
+    def _body_size(self, record):
+        if record.content is None and record.blob:
+            try:
+                return os.path.getsize(os.path.join(self.blobs.directory, record.blob))
+            except OSError:
+                return 0
+        return len(record.content or "")
+
+    def _body_token_chunks(self, record):
+        # The body in INDEX_BATCH_CHARS pieces, from its file if not loaded
+        if record.content is None and record.blob:
+            with open(os.path.join(self.blobs.directory, record.blob), 'r') as f:
+                yield from NoteSearchIndex.tokenize_chunks(iter(lambda: f.read(INDEX_BATCH_CHARS), ""))
+        else:
+            content = record.content or ""
+            yield from NoteSearchIndex.tokenize_chunks(
+                content[i:i + INDEX_BATCH_CHARS] for i in range(0, len(content), INDEX_BATCH_CHARS))
+
+    def _cancel_index_job(self):
+        if self._index_job is not None:
+            self._index_job[2].close()
+            self._index_job = None
+
+    def _index_batch(self):
+        # Startup windows come first
+        if self._startup_queue:
+            return
+        budget = INDEX_BATCH_CHARS
+        skipped = []
+        while budget > 0:
+            if self._index_job is not None:
+                record, source, chunks, tokens = self._index_job
+                if (record not in self._unindexed or record in self._pending_content
+                        or record.content is not source[0] or record.blob != source[1]):
+                    # Removed or changed since; started over when picked again
+                    self._cancel_index_job()
+                    continue
+                budget -= INDEX_BATCH_CHARS
+                try:
+                    chunk_tokens = next(chunks)
+                    # Added as they come, so no single turn merges them all
+                    self.search_index.add(record.id, chunk_tokens)
+                    tokens |= chunk_tokens
+                    continue
+                except StopIteration:
+                    pass
+                except (OSError, ValueError) as e:
+                    logger.error("Error indexing note body: %s", e)
+                self._index_job = None
+                self._unindexed.discard(record)
+                # Drops whatever an older version of the body left behind
+                self.search_index.update(record.id, record.title, tokens)
+                continue
+            if not self._unindexed:
+                break
+            record = self._unindexed.pop()
+            if record in self._pending_content:
+                # Its editor holds newer text; left to the next search
+                skipped.append(record)
+                continue
+            size = self._body_size(record)
+            if size > INDEX_BATCH_CHARS:
+                # Too big for one turn; tokenised a piece per turn
+                self._unindexed.add(record)
+                self._index_job = (record, (record.content, record.blob), self._body_token_chunks(record), set())
+                continue
+            budget -= size + len(record.title) + 1
+            self._index_record(record)
+        self._unindexed.update(skipped)
+        if budget > 0:
+            self._index_timer.stop()
+
+    def search_notes(self, query):
+        """Return the records matching query, in display order."""
+        self.flush_pending_edits()
+        # The note of an unfinished job is still in _unindexed
+        self._cancel_index_job()
+        for record in self._unindexed:
+            self._index_record(record)
+        self._unindexed.clear()
+        ids = self.search_index.search(query)
+        return [record for note_id, record in self.records.items() if note_id in ids]
+
+    def open_history_dialog(self, record):
+        # Make sure the latest edits are a revision before browsing
+        self.flush_pending_edits()
+        if record in self._history_pending:
+            self.history.record(record.id, record.content)
+        with metrics.span("dialog.history"):
+            dlg = HistoryDialog(self, record)
+        dlg.exec_()
+
+    def open_search_dialog(self):
+        if self.search_dialog is None:
+            with metrics.span("dialog.search"):
+                self.search_dialog = SearchDialog(self)
+        self.search_dialog.show()
+        self.search_dialog.raise_()
+        self.search_dialog.activateWindow()
 
-    def save_notes(self):
+    def flush_pending_edits(self):
+        # Copy edited note bodies into their records, once per batch of edits
+        for record in self._pending_content:
+            if record.widget:
+                record.widget.sync_content()
+        self._pending_content.clear()
+
+    def _autosave(self):
+        self.save_counters["wakeups"] += 1
+        self.save_notes()
+
+    @metrics.timed("save_notes")
+    def save_notes(self, force=False):
+        if not self._dirty and not force:
+            self.save_counters["skipped"] += 1
+            return
+        self._dirty = False
+        self.flush_pending_edits()
+        # Autosave points double as revision points
+        for record in self._history_pending:
+            if record.id in self.records:
+                self.history.record(record.id, record.content)
+        self._history_pending.clear()
+        # Only capture plain data here; serialisation and file I/O happen on
+        # the worker thread. The note dicts are freshly built and never
+        # touched again by the GUI thread.
+        history = self.history.take_changes() if self.history.changed else None
+        self._save_seq += 1
+        snapshot = (self.theme, tuple(record.to_data() for record in self.records.values()), history, self._save_seq)
+        self.save_worker.submit(snapshot)
+        self.save_counters["snapshots"] += 1
+
+    def watch_save_files(self):
+        # Only the save files are watched; replacing or deleting one reports
+        # it and drops it from the watch list, so it is re-added here. The
+        # directory, which may be $HOME, is watched only while one of them
+        # does not exist yet.
+        paths = self.store.paths()
+        existing = [path for path in paths if os.path.exists(path)]
+        missing = [path for path in existing if path not in self.watcher.files()]
+        if missing:
+            self.watcher.addPaths(missing)
+        directory = os.path.dirname(SAVE_FILE)
+        watching = directory in self.watcher.directories()
+        if len(existing) < len(paths) and not watching:
+            self.watcher.addPath(directory)
+        elif len(existing) == len(paths) and watching:
+            self.watcher.removePath(directory)
+        self._watched_signature = files_signature(paths)
+
+    def save_directory_changed(self, path):
+        # Some other file in the directory, most likely
+        if files_signature(self.store.paths()) != self._watched_signature:
+            self.schedule_external_check()
+
+    def schedule_external_check(self, path=None):
+        if not self._external_timer.isActive():
+            self._external_timer.start()
+
+    def check_external_changes(self):
+        # The save worker reads the files and reports back through
+        # apply_external_changes(), so this never waits for the lock
+        self.watch_save_files()
+        self.save_worker.request_refresh()
+
+    def apply_external_changes(self, changes):
+        theme, notes_data, signature = changes
+        metrics.count("external_reloads")
+        if notes_data is None:
+            logger.warning("Save file was damaged; saving the notes of this instance again")
+            for note_id in self.records:
+                self._edited[note_id] = self._save_seq + 1
+            self.note_changed()
+            self.save_worker.accept_signature(signature, self._save_seq)
+            return
+        logger.info("Save files changed by another program; merging")
         try:
-            data = {
-                "theme": self.theme,
-                "notes": [note.get_data() for note in self.notes]
-            }
-            with open(SAVE_FILE, 'w') as f:
-                json.dump(data, f)
+            self.merge_external_notes(theme, notes_data)
         except Exception as e:
-            print(f"Error saving notes: {e}")
+            # Raising out of a slot would abort the app
+            logger.exception("Error merging external changes: %s", e)
+            return
+        # Snapshots taken from here on include the merged contents
+        self.save_worker.accept_signature(signature, self._save_seq)
+
+    def merge_external_notes(self, theme, notes_data):
+        """Bring the notes in line with data written by someone else.
+
+        Only the notes that differ are touched, in place. Notes with local
+        changes that have not reached the disk yet keep them, and are saved
+        again afterwards on top of the new contents.
+        """
+        self.flush_pending_edits()
+        written = self.save_worker.written_seq
+        self._edited = {note_id: seq for note_id, seq in self._edited.items() if seq > written}
+        unsaved = self._edited
+        order = []
+        self._loading = True
+        self.notes_model.begin_batch()
+        try:
+            for note_data in notes_data:
+                note_id = note_data["id"]
+                record = self.records.get(note_id)
+                if note_id in unsaved:
+                    # Changed, added or deleted here since the last save
+                    if record is not None:
+                        order.append(note_id)
+                    continue
+                incoming = NoteRecord.from_data(note_data)
+                if record is None:
+                    self.records[note_id] = incoming
+                    self._unindexed.add(incoming)
+                    self.note_geometry_changed(incoming)
+                    self.notes_model.note_added(incoming)
+                    if incoming.is_visible:
+                        self._create_note_widget(incoming).show()
+                else:
+                    self.update_record(record, incoming)
+                order.append(note_id)
+            incoming_ids = set(order)
+            for note_id, record in list(self.records.items()):
+                if note_id not in incoming_ids and note_id not in unsaved:
+                    self.remove_record(record)
+            # Disk order, then notes only this instance has so far
+            order += [note_id for note_id in self.records if note_id not in incoming_ids]
+            if order != list(self.records):
+                self.records = {note_id: self.records[note_id] for note_id in order}
+                self.notes_model.reset()
+        finally:
+            self.notes_model.end_batch()
+            self._loading = False
+        self._index_timer.start()
+        if theme != self.theme:
+            self.toggle_theme()
+        if unsaved:
+            # Anything a dropped snapshot carried goes out again
+            self.history.request_rewrite()
+            self.note_changed()
+
+    def update_record(self, record, incoming):
+        """Copy changed fields from incoming into record and its window."""
+        if incoming.blob and record.content is not None:
+            # Same file name for the same note, so compare the text itself
+            self.load_note_body(incoming)
+        content_changed = incoming.content != record.content or incoming.blob != record.blob
+        fields = ("title", "font_size", "is_visible", "color_index", "size", "pos")
+        changed = [name for name in fields if getattr(incoming, name) != getattr(record, name)]
+        if not changed and not content_changed:
+            return
+        for name in changed:
+            setattr(record, name, getattr(incoming, name))
+        widget = record.widget
+        if content_changed:
+            record.content = incoming.content
+            record.blob = incoming.blob
+            self._pending_content.discard(record)
+            self._unindexed.add(record)
+            if widget is not None and record.is_large() != isinstance(widget.text_edit, QPlainTextEdit):
+                # The editor type follows the body size; rebuild this one window
+                widget.deleteLater()
+                record.widget = widget = None
+        if widget is None:
+            if record.is_visible:
+                self._create_note_widget(record).show()
+        else:
+            if content_changed:
+                widget.text_edit.setPlainText(record.content)
+            if "title" in changed:
+                widget.title_edit.setText(record.title)
+                self._unindexed.add(record)
+            if "font_size" in changed:
+                widget.font_size_edit.setText(str(record.font_size))
+                widget.change_font_size(record.font_size)
+            if "color_index" in changed:
+                widget.apply_color()
+            if "size" in changed or "pos" in changed:
+                widget.load_geometry()
+            if "is_visible" in changed:
+                widget.setVisible(record.is_visible)
+        self.note_geometry_changed(record)
+        self.notes_model.note_updated(record)
 
+    @metrics.timed("toggle_theme")
     def toggle_theme(self):
         self.theme = 'dark' if self.theme == 'light' else 'light'
+        theme_resources.set_theme(self.theme)
         
-        # Update all notes
-        for note in self.notes:
+        # Update all notes; windowless ones pick up the theme when they are built.
+        # Painting is held off per note so each one repaints once at the end.
+        for record in self.records.values():
+            note = record.widget
+            if note is None:
+                continue
+            note.setUpdatesEnabled(False)
             note.theme = self.theme
             note.apply_color()
             # Update icons
-            note.hide_button.setIcon(QIcon(get_icon_pixmap('minimize', self.theme)))
-            note.delete_button.setIcon(QIcon(get_icon_pixmap('delete', self.theme)))
-            note.palette_button.setIcon(QIcon(get_icon_pixmap('palette', self.theme)))
-            note.settings_button.setIcon(QIcon(get_icon_pixmap('settings', self.theme)))
+            note.hide_button.setIcon(theme_resources.icon('minimize', self.theme))
+            note.delete_button.setIcon(theme_resources.icon('delete', self.theme))
+            note.palette_button.setIcon(theme_resources.icon('palette', self.theme))
+            note.settings_button.setIcon(theme_resources.icon('settings', self.theme))
+            note.setUpdatesEnabled(True)
         
         # Update tray icon
-        self.tray_icon.setIcon(QIcon(create_sticky_note_icon(self.theme)))
+        self.tray_icon.setIcon(theme_resources.icon('tray', self.theme))
         
         # Update tooltip style
         self.update_tooltip_style()
+        self.action_registry.apply_theme(self.theme)
+        self.dialogs.apply_theme(self.theme)
+        if self.showhide_dialog is not None:
+            self.showhide_dialog.apply_theme(self.theme)
+        if self.search_dialog is not None:
+            self.search_dialog.apply_theme(self.theme)
+        self.notes_model.refresh_all()
+        self.note_changed()
+
+    def install_application_stylesheet(self):
+        # Set once; theme and colour changes only flip dynamic properties
+        QApplication.instance().setStyleSheet(theme_resources.stylesheet('application'))
 
     def update_tooltip_style(self):
-        tooltip_bg = '#222' if self.theme == 'dark' else '#fff'
-        tooltip_fg = '#fff' if self.theme == 'dark' else '#000'
-        QApplication.instance().setStyleSheet(
-            f"QToolTip {{ color: {tooltip_fg}; background-color: {tooltip_bg}; border: 1px solid #888; }}")
+        # Tooltip colours come from the palette so the application
+        # stylesheet never has to change with the theme
+        palette = QToolTip.palette()
+        palette.setColor(QPalette.ToolTipBase, QColor('#222' if self.theme == 'dark' else '#fff'))
+        palette.setColor(QPalette.ToolTipText, QColor('#fff' if self.theme == 'dark' else '#000'))
+        QToolTip.setPalette(palette)
+
+    def shutdown(self):
+        # Safe to call more than once
+        profiler.stop()
+        self.save_timer.stop()
+        if self.save_worker.isRunning():
+            # Merge anything another instance wrote, or the final save
+            # would be dropped as conflicting
+            self.save_worker.flush()
+            try:
+                changes = self.save_worker.read_external_changes()
+            except Exception as e:
+                logger.exception("Error reading external changes: %s", e)
+            else:
+                if changes is not None:
+                    self.apply_external_changes(changes)
+            self.save_notes()
+            # Make sure the final snapshot is on disk before the event loop ends
+            self.save_worker.stop()
+            self.store.close()
+
+    def handle_remote_command(self, command):
+        """Run a request forwarded by a later launch (see InstanceServer)."""
+        name = command.get("command")
+        logger.info("Forwarded command: %s", name)
+        if name == "new_note":
+            if command.get("title"):
+                self.add_note(command["title"])
+            else:
+                self.prompt_new_note()
+        elif name == "show_all":
+            self.show_all_notes()
+        elif name == "show_hide":
+            self.open_showhide_dialog()
+        elif name == "activate":
+            self.bring_notes_to_workspace()
+
+    def toggle_profiling(self):
+        if profiler.active:
+            profiler.stop()
+            self.tray_icon.showMessage("Sticky Notes", f"Profile written to {profiler.path}")
+        else:
+            profiler.start(PROFILE_FILE)
+        self.action_registry["profiling"].setText("Stop Profiling" if profiler.active else "Start Profiling")
+
+    def export_metrics(self, path=METRICS_FILE):
+        metrics.export(path, save_counters=dict(self.save_counters), save_worker={
+            "writes": self.save_worker.writes,
+            "coalesced": self.save_worker.coalesced,
+        }, notes={"total": len(self.records),
+                  "with_window": sum(1 for record in self.records.values() if record.widget)})
 
     def quit_app(self):
-        self.save_notes()
+        self.shutdown()
         QApplication.quit()
 
-    def note_title_changed(self, note_widget, new_title):
-        # Update tray checklist
-        # Update Show/Hide dialog if open
-        if self.showhide_dialog:
-            self.showhide_dialog.set_checkbox(note_widget, note_widget.is_visible)
+    def note_title_changed(self, record, new_title):
+        self._unindexed.add(record)
+        # Update Show/Hide rows
+        self.notes_model.note_updated(record)
         # Update in-memory title (already done in note_widget)
 
     def bring_notes_to_workspace(self):
         # Record all open notes
-        open_notes = [note for note in self.notes if note.is_visible]
-        print(f"[LOG] Bringing notes to workspace: {open_notes}")
+        open_notes = [record for record in self.records.values() if record.is_visible]
+        logger.info("Bringing %d notes to workspace", len(open_notes))
         # Hide all visible notes
         self.hide_all_notes()
         # Force a repaint and update of each note window
         
-        for note in open_notes:
+        for record in open_notes:
             # note.hide()
             # note.show()
-            note.set_visible(True)
+            self.set_note_visible(record, True)
         
         # for note in self.notes:
         #     note.hide()
@@ -1070,7 +4255,8 @@ class StickyNotesApp(QMainWindow):
         #     note.set_visible(True)
 
     def show_readme(self):
-        dialog = ReadmeDialog(self.theme, self)
+        dialog = self.dialogs.get("readme")
+        dialog.center_on_screen()
         dialog.exec_()
 
 # if __name__ == "__main__":
@@ -1080,8 +4266,37 @@ class StickyNotesApp(QMainWindow):
 #     sys.exit(app.exec_())
     
 if __name__ == "__main__":
-    app = QApplication(sys.argv)
+    if args.convert:
+        try:
+            convert_save_file(*args.convert)
+        except (OSError, ValueError) as e:
+            sys.exit(f"Could not convert {args.convert[0]}: {e}")
+        sys.exit(0)
+    if args.export or args.import_notes:
+        fmt, path = args.export or args.import_notes
+        if fmt not in EXCHANGE_FORMATS:
+            sys.exit(f"Unknown format {fmt!r}, expected one of: {', '.join(EXCHANGE_FORMATS)}")
+        if args.export:
+            print(f"Exported {export_notes(fmt, path)} notes to {path}")
+        else:
+            added, updated = import_notes(fmt, path, args.merge_by)
+            print(f"Imported {added} new notes and updated {updated} from {path}")
+        sys.exit(0)
+    logging.basicConfig(level=os.getenv("STICKY_NOTES_LOG_LEVEL", "WARNING").upper(),
+                        format="%(asctime)s %(levelname)s %(name)s: %(message)s")
+    metrics.enabled = metrics.enabled or logger.isEnabledFor(logging.DEBUG)
+    if args.profile:
+        profiler.start(args.profile)
+    app = QApplication(sys.argv[:1] + qt_args)
+    server = InstanceServer()
+    if not server.start():
+        # Another instance came up while this one was starting
+        sys.exit(0 if send_to_running_instance(command_from_args(args)) else 1)
     window = StickyNotesApp()
+    server.handler = window.handle_remote_command
+    command = command_from_args(args)
+    if command["command"] != "activate":
+        QTimer.singleShot(0, lambda: window.handle_remote_command(command))
     window.setAttribute(Qt.WA_DontShowOnScreen, True)  # Make invisible but Qt-functional
     window.setWindowFlags(Qt.Tool)                     # Optional: hide from taskbar
     window.show()
@@ -0,0 +1,69 @@
+import os
+import random
+import shutil
+import sys
+import tempfile
+import unittest
+
+os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sticky_notes import BinaryNoteFile, BinaryStore, convert_save_file, write_binary_notes
+
+
+class BinaryStoreTest(unittest.TestCase):
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+        self.path = os.path.join(self.dir, "notes.snb")
+        notes = [{"id": "n%d" % i, "title": "note %d" % i, "content": "body %d " % i * 100}
+                 for i in range(5)]
+        write_binary_notes(self.path, "dark", notes)
+        with open(self.path, "rb") as f:
+            self.data = f.read()
+
+    def tearDown(self):
+        shutil.rmtree(self.dir)
+
+    def write(self, data):
+        with open(self.path, "wb") as f:
+            f.write(data)
+
+    def test_truncated_file_is_moved_aside(self):
+        self.write(self.data[:len(self.data) // 2])
+        store = BinaryStore(self.path)
+        self.assertEqual(store.load(), ("dark", []))
+        self.assertEqual(store.recovered, self.path + ".corrupt")
+        self.assertFalse(os.path.exists(self.path))
+
+    def test_damage_raises_value_error(self):
+        rng = random.Random(0)
+        for _ in range(200):
+            data = bytearray(self.data)
+            if rng.random() < 0.5:
+                del data[rng.randrange(len(data)):]
+            else:
+                for _ in range(4):
+                    data[rng.randrange(len(data))] = rng.randrange(256)
+            self.write(bytes(data))
+            try:
+                reader = BinaryNoteFile(self.path)
+                try:
+                    list(reader.iter_notes())
+                finally:
+                    reader.close()
+            except ValueError:
+                pass
+
+    def test_convert_leaves_damaged_source_alone(self):
+        src = os.path.join(self.dir, "notes.json")
+        with open(src, "w") as f:
+            f.write('{"theme": "dark", "notes": [{"id": "a", "ti')
+        with self.assertRaises(ValueError):
+            convert_save_file(src, self.path + ".new")
+        with open(src) as f:
+            self.assertEqual(f.read(), '{"theme": "dark", "notes": [{"id": "a", "ti')
+        self.assertFalse(os.path.exists(self.path + ".new"))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,84 @@
+import os
+import shutil
+import sys
+import tempfile
+import unittest
+
+os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sticky_notes import JournalStore
+
+
+def note(note_id, content):
+    return {"id": note_id, "title": note_id, "content": content}
+
+
+class JournalStoreTest(unittest.TestCase):
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+        self.path = os.path.join(self.dir, "notes.json")
+
+    def tearDown(self):
+        shutil.rmtree(self.dir)
+
+    def reload(self):
+        store = JournalStore(self.path)
+        theme, notes = store.load()
+        return store, {n["id"]: n["content"] for n in notes}
+
+    def test_edit_after_stale_journal_survives_reload(self):
+        store = JournalStore(self.path)
+        store.load()
+        store.write("dark", [note("a", "one")])
+        with open(store.journal_path) as f:
+            stale = f.read()
+        store.compact("dark", [note("a", "one")])
+        # Crash between the snapshot rename and the journal reset
+        with open(store.journal_path, "w") as f:
+            f.write(stale)
+
+        store, notes = self.reload()
+        self.assertEqual(notes, {"a": "one"})
+        store.write("dark", [note("a", "two")])
+        self.assertEqual(self.reload()[1], {"a": "two"})
+
+    def test_edit_after_corrupt_snapshot_survives_reload(self):
+        store = JournalStore(self.path)
+        store.load()
+        store.compact("dark", [note("a", "one")])
+        store.write("dark", [note("a", "one"), note("b", "two")])
+        with open(self.path, "w") as f:
+            f.write("{not json")
+
+        store, notes = self.reload()
+        self.assertTrue(os.path.exists(self.path + ".corrupt"))
+        store.write("dark", [note("c", "three")])
+        self.assertEqual(self.reload()[1], {"c": "three"})
+
+    def test_edit_after_torn_journal_line_survives_reload(self):
+        store = JournalStore(self.path)
+        store.load()
+        store.write("dark", [note("a", "one")])
+        with open(store.journal_path, "a") as f:
+            f.write('{"op": "put", "id"')
+
+        store, notes = self.reload()
+        store.write("dark", [note("a", "one"), note("b", "two")])
+        self.assertEqual(self.reload()[1], {"a": "one", "b": "two"})
+
+    def test_edit_after_unterminated_journal_line_survives_reload(self):
+        store = JournalStore(self.path)
+        store.load()
+        store.write("dark", [note("a", "one")])
+        # A complete record, but the crash came before its newline
+        with open(store.journal_path, "a") as f:
+            f.write('{"op": "del", "id": "a"}')
+
+        store, notes = self.reload()
+        store.write("dark", [note("b", "two")])
+        self.assertEqual(self.reload()[1], {"b": "two"})
+
+
+if __name__ == "__main__":
+    unittest.main()
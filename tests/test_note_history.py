@@ -0,0 +1,79 @@
+import os
+import shutil
+import sys
+import tempfile
+import unittest
+
+os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sticky_notes import NoteHistory
+
+
+class NoteHistoryTest(unittest.TestCase):
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+        self.path = os.path.join(self.dir, "history.json")
+
+    def tearDown(self):
+        shutil.rmtree(self.dir)
+
+    def test_huge_revision_keeps_other_history(self):
+        history = NoteHistory(budget=2 * 1024 * 1024)
+        for i in range(5):
+            history.record("a", "text %d" % i, timestamp=i)
+        history.record("b", "x" * 3 * 1024 * 1024, timestamp=10)
+        self.assertEqual(len(history.revisions("a")), 5)
+        self.assertEqual(history.revisions("b"), [])
+        history.record("b", "small", timestamp=11)
+        self.assertEqual(history.text_at("b", 0), "small")
+
+    def test_newest_revision_is_never_evicted(self):
+        history = NoteHistory(budget=100)
+        history.max_revision = 1000
+        history.record("a", "a" * 50, timestamp=1)
+        history.record("b", "b" * 90, timestamp=2)
+        self.assertEqual(history.revisions("a"), [])
+        self.assertEqual(history.text_at("b", 0), "b" * 90)
+
+    def write(self, history):
+        NoteHistory.write_changes(self.path, history.take_changes())
+
+    def test_log_replays_to_same_history(self):
+        history = NoteHistory()
+        history.record("a", "one", timestamp=1)
+        history.record("b", "two", timestamp=2)
+        self.write(history)
+        size = os.path.getsize(self.path)
+        history.record("a", "one more", timestamp=3)
+        history.remove("b")
+        self.write(history)
+        # Only the new revision and the removal were appended
+        with open(self.path) as f:
+            f.seek(size)
+            self.assertEqual(len(f.readlines()), 2)
+
+        loaded = NoteHistory()
+        loaded.load(self.path)
+        self.assertEqual(loaded.revisions("a"), [1, 3])
+        self.assertEqual(loaded.text_at("a", 1), "one more")
+        self.assertFalse(loaded.has("b"))
+        self.assertFalse(loaded.changed)
+
+    def test_torn_log_line_forces_rewrite(self):
+        history = NoteHistory()
+        history.record("a", "one", timestamp=1)
+        self.write(history)
+        with open(self.path, "a") as f:
+            f.write('{"id": "a", "rev"')
+        loaded = NoteHistory()
+        loaded.load(self.path)
+        loaded.record("a", "two", timestamp=2)
+        self.write(loaded)
+        again = NoteHistory()
+        again.load(self.path)
+        self.assertEqual(again.revisions("a"), [1, 2])
+
+
+if __name__ == "__main__":
+    unittest.main()